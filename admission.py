@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware
+
+import fast_json
+
+# Limits are per worker process (with --workers N the server admits N times as much)
+MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+CLIENT_CONCURRENT = int(os.getenv("ADMISSION_CLIENT_CONCURRENT", "8"))
+CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "20"))  # cost units per second, 0 disables
+CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "40"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+MAX_TRACKED_CLIENTS = 10000
+
+# Slots a call occupies (and rate tokens it spends); tools not listed cost 1
+TOOL_COSTS = {
+    "get_ninjamock_project_full": 4,
+    "get_ninjamock_project_elements": 4,
+    "search_all": 2,
+    "search_project_elements": 4,
+}
+
+
+class Rejected(Exception):
+    """The call was not admitted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Client:
+    __slots__ = ("inflight", "tokens", "stamp")
+
+    def __init__(self, burst: float):
+        self.inflight = 0
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Admission control for tool calls.
+
+    - per client (auth token, or client address when unauthenticated): a token-bucket rate limit
+      and a cap on in-flight + queued cost;
+      a client over either limit is rejected at once, so it cannot fill the shared queue
+    - global: a cap on in-flight cost; calls beyond it wait in a bounded FIFO queue for at most
+      `queue_timeout` seconds and are rejected when the queue is full or the wait times out
+
+    Rejections carry a retry-after hint derived from the bucket refill time or the recent latency
+    of the tool. Everything runs on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, client_concurrent: int = CLIENT_CONCURRENT,
+                 client_rate: float = CLIENT_RATE, client_burst: float = CLIENT_BURST,
+                 max_queue: int = MAX_QUEUE, queue_timeout: float = QUEUE_TIMEOUT,
+                 costs: Optional[Dict[str, int]] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.client_concurrent = max(1, client_concurrent)
+        self.client_rate = client_rate
+        self.client_burst = max(1.0, client_burst)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.costs = dict(TOOL_COSTS if costs is None else costs)
+        self._inflight = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        self._clients: Dict[str, _Client] = {}
+        self._latency: Dict[str, float] = {}
+        self.stats = {"admitted": 0, "queued": 0, "rejected_rate": 0, "rejected_client_concurrency": 0,
+                      "rejected_queue_full": 0, "rejected_queue_timeout": 0}
+
+    def cost(self, tool: str) -> int:
+        # Never more than a limit, or the call could not be admitted at all
+        return max(1, min(self.costs.get(tool, 1), self.client_concurrent, self.max_concurrent))
+
+    def _retry_hint(self, tool: str) -> float:
+        return round(max(1.0, self._latency.get(tool, 1.0)), 1)
+
+    def _client(self, key: str) -> _Client:
+        client = self._clients.get(key)
+        if client is None:
+            if len(self._clients) >= MAX_TRACKED_CLIENTS:
+                self._forget_idle_clients()
+            client = self._clients[key] = _Client(self.client_burst)
+        return client
+
+    def _forget_idle_clients(self):
+        now = time.monotonic()
+        for key in [k for k, c in self._clients.items()
+                    if not c.inflight and (not self.client_rate or now - c.stamp > self.client_burst / self.client_rate)]:
+            del self._clients[key]
+
+    def _admit_client(self, client: _Client, tool: str, cost: int):
+        if self.client_rate:
+            now = time.monotonic()
+            client.tokens = min(self.client_burst, client.tokens + (now - client.stamp) * self.client_rate)
+            client.stamp = now
+            if client.tokens < cost:
+                self.stats["rejected_rate"] += 1
+                raise Rejected("rate_limited", round(max(0.1, (cost - client.tokens) / self.client_rate), 1))
+        if client.inflight + cost > self.client_concurrent:
+            self.stats["rejected_client_concurrency"] += 1
+            raise Rejected("too_many_concurrent_calls", self._retry_hint(tool))
+        if self.client_rate:
+            client.tokens -= cost
+        client.inflight += cost
+
+    async def _acquire(self, tool: str, cost: int):
+        if not self._waiters and self._inflight + cost <= self.max_concurrent:
+            self._inflight += cost
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise Rejected("server_busy", self._retry_hint(tool))
+        self.stats["queued"] += 1
+        entry = (cost, asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        try:
+            done, _ = await asyncio.wait((entry[1],), timeout=self.queue_timeout)
+        except BaseException:
+            self._abandon(entry)
+            raise
+        if not done:
+            self._abandon(entry)
+            self.stats["rejected_queue_timeout"] += 1
+            raise Rejected("server_busy", self._retry_hint(tool))
+
+    def _abandon(self, entry: Tuple[int, asyncio.Future]):
+        cost, future = entry
+        if future.done() and not future.cancelled():
+            # The slot was granted just as the waiter gave up
+            self._release(cost)
+            return
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+        future.cancel()
+        self._wake()
+
+    def _release(self, cost: int):
+        self._inflight -= cost
+        self._wake()
+
+    def _wake(self):
+        # Strict FIFO: a large call at the head is not overtaken by smaller ones behind it
+        while self._waiters and self._inflight + self._waiters[0][0] <= self.max_concurrent:
+            cost, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._inflight += cost
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, client_key: str, tool: str):
+        """Hold an admission slot for one call; raises Rejected when the call is not admitted."""
+        cost = self.cost(tool)
+        client = self._client(client_key)
+        self._admit_client(client, tool, cost)
+        try:
+            await self._acquire(tool, cost)
+        except BaseException:
+            # The call never ran: give back its concurrency slot and rate tokens, so server-wide
+            # overload is not charged to the client's own rate budget
+            client.inflight -= cost
+            if self.client_rate:
+                client.tokens = min(self.client_burst, client.tokens + cost)
+            raise
+        self.stats["admitted"] += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            previous = self._latency.get(tool)
+            self._latency[tool] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+            client.inflight -= cost
+            self._release(cost)
+
+    def snapshot(self) -> Dict:
+        return {
+            "inflight": self._inflight,
+            "queued_now": len(self._waiters),
+            "clients": len(self._clients),
+            "limits": {"max_concurrent": self.max_concurrent, "client_concurrent": self.client_concurrent,
+                       "client_rate": self.client_rate, "client_burst": self.client_burst,
+                       "max_queue": self.max_queue, "queue_timeout": self.queue_timeout},
+            **self.stats,
+        }
+
+
+class AdmissionMiddleware(Middleware):
+    """
+    Applies an AdmissionController to every tools/call. Rejected calls return immediately as a tool
+    error (isError) whose text is {"error", "reason", "retry_after"}, instead of running the tool.
+    """
+
+    def __init__(self, controller: AdmissionController, client_key: Callable[[], str]):
+        self.controller = controller
+        self.client_key = client_key
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        try:
+            async with self.controller.slot(self.client_key(), tool):
+                return await call_next(context)
+        except Rejected as e:
+            # Raised, not returned: the MCP server only marks a result isError for exceptions, and an agent
+            # must not mistake the busy message for tool output (or have it checked against the outputSchema)
+            message = f"Server is busy ({e.reason}); retry {tool} after {e.retry_after} seconds."
+            raise ToolError(fast_json.dumps_str({"error": message, "reason": e.reason, "retry_after": e.retry_after}))
@@ -0,0 +1,66 @@
+"""
+Recall / latency / memory trade-off of reduced-dimension indices, per corpus, fully offline.
+
+The stored 1536-d vectors of each registered index are reconstructed and used both as the corpus
+and (with noise added, to mimic paraphrased queries) as queries. For every target dimension and
+reduction (Matryoshka truncation, PCA) it reports recall@k against the full-dimension exact
+search, mean single-query search latency and serialized index size.
+
+    python bench_dimensions.py --dims 128 256 512 --k 5 --noise 0.8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from index_reduction import REDUCTIONS, build_index, fit_query_vector
+from rag_search import INDICES, get_faiss, live_index
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def measure(index, queries: np.ndarray, k: int):
+    found = []
+    start = time.perf_counter()
+    for q in queries:
+        found.append(index.search(fit_query_vector(index, q.reshape(1, -1)), k)[1][0])
+    latency_us = (time.perf_counter() - start) / len(queries) * 1e6
+    return np.array(found), latency_us, get_faiss().serialize_index(index).nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512, 1024])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.8, help="norm of the noise added to each query vector")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'corpus':>16} {'reduction':>10} {'dims':>5} {'recall@k':>9} {'search_us':>10} {'bytes':>10}")
+    for name in INDICES:
+        index = live_index(name)["index"]
+        vectors = index.reconstruct_n(0, index.ntotal)
+        noise = rng.standard_normal(vectors.shape).astype("float32")
+        noise *= args.noise / np.linalg.norm(noise, axis=1, keepdims=True)
+        queries = vectors + noise
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        k = min(args.k, index.ntotal)
+
+        truth, latency, size = measure(index, queries, k)
+        print(f"{name:>16} {'none':>10} {index.d:>5} {1.0:>9.3f} {latency:>10.1f} {size:>10}")
+        for reduction in REDUCTIONS:
+            for dims in args.dims:
+                if reduction == "pca" and dims > index.ntotal:
+                    # PCA cannot produce more components than training vectors
+                    continue
+                reduced, _ = build_index(vectors, dims, reduction)
+                found, latency, size = measure(reduced, queries, k)
+                print(f"{name:>16} {reduction:>10} {dims:>5} {recall_at_k(truth, found):>9.3f} {latency:>10.1f} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
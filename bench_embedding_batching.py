@@ -0,0 +1,63 @@
+"""
+Benchmark for query-embedding micro-batching against a local stub embedding server.
+
+Fires `--queries` distinct concurrent embed_query_async calls with batching disabled (window 0,
+batch size 1) and enabled, and reports wall time, API requests made and per-query latency.
+
+    python bench_embedding_batching.py --queries 200 --latency 0.05 --window-ms 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from stubs import StubEmbeddingServer
+
+
+async def run(queries: int, window_ms: float, max_size: int) -> dict:
+    import rag_search
+    from embedding_batcher import EmbeddingBatcher
+
+    rag_search._batchers.clear()
+    rag_search._batchers[rag_search.MODEL] = EmbeddingBatcher(
+        lambda texts: rag_search.embed_texts(texts), window_ms=window_ms, max_size=max_size
+    )
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        await rag_search.embed_query_async(f"query {i} {window_ms}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "seconds": round(elapsed, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+        **rag_search.batcher_stats()[rag_search.MODEL],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub API latency per request (s)")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-size", type=int, default=64)
+    args = parser.parse_args()
+
+    with StubEmbeddingServer(latency=args.latency) as stub:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        for label, window, size in (("unbatched", 0.0, 1), ("batched", args.window_ms, args.max_size)):
+            before = stub.requests
+            stats = asyncio.run(run(args.queries, window, size))
+            print(f"{label:>10}: {stub.requests - before} API requests, {stats}")
+
+
+if __name__ == "__main__":
+    main()
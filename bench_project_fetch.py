@@ -0,0 +1,82 @@
+"""
+Latency / peak-memory benchmark for fetching large Ninjamock projects.
+
+Serves a synthetic multi-MB project from a local stub and compares the old buffered fetch
+(`response.json()` of the whole body) with the streaming, projection-capable fetch used by
+`get_ninjamock_project_full`. Peak memory is Python allocations measured with tracemalloc.
+
+    python bench_project_fetch.py --pages 40 --elements 300 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+
+import httpx
+
+from stubs import StubNinjamockServer, synthetic_project
+
+
+async def measure(fn, repeat: int) -> dict:
+    await fn()  # warm the connection pool
+    latencies, peaks = [], []
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = await fn()
+        latencies.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "latency_ms": round(sorted(latencies)[len(latencies) // 2] * 1000, 1),
+        "peak_mb": round(max(peaks) / 2**20, 2),
+        "result_bytes": len(json.dumps(result)),
+    }
+
+
+async def run(args):
+    project = synthetic_project(pages=args.pages, elements_per_page=args.elements)
+    with StubNinjamockServer(project) as stub:
+        os.environ["NINJAMOCK_BASE_URL"] = stub.base_url
+        import ninjamock_api
+        from json_projection import ijson, project_value
+
+        print(f"project: {len(stub.project_bytes) / 2**20:.1f} MB JSON, {len(stub.project_gzip) / 2**20:.1f} MB gzipped, "
+              f"ijson backend: {ijson.backend}")
+        path = "/api/v1/projects/demo"
+        async with httpx.AsyncClient(base_url=stub.base_url) as client:
+            async def buffered():
+                response = await client.get(path, timeout=60)
+                response.raise_for_status()
+                return response.json()
+
+            cases = [("buffered full (before)", buffered)]
+            for label, kwargs in [
+                ("stream full", {}),
+                ("stream /pages/1", {"pointer": "/pages/1"}),
+                ("stream /pages/<last>", {"pointer": f"/pages/{args.pages - 1}"}),
+                ("stream max_depth=2", {"max_depth": 2}),
+                ("stream fields=id,name,type,children", {"fields": ["id", "name", "type", "children", "pages", "elements"]}),
+            ]:
+                async def projected(kwargs=kwargs):
+                    return await ninjamock_api.get_json_projected(path, {}, timeout=60, **kwargs)
+                expected = project_value(project, kwargs.get("pointer"), kwargs.get("max_depth"), kwargs.get("fields"))
+                assert await projected() == expected, f"projection mismatch for {label}"
+                cases.append((label, projected))
+
+            for label, fn in cases:
+                print(f"{label:>38}: {await measure(fn, args.repeat)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--elements", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Serialization cost per tool response, before and after the fast JSON path.
+
+For a representative payload of each tool this times the whole response path after the tool
+function returns: FastMCP ToolResult (text content + structured content), the MCP server's
+outputSchema validation, and the JSON-RPC envelope written to the wire.
+
+- before: FastMCP's default text serializer (pydantic_core) and the plain result dict
+- after:  fast_json serializer (orjson), pre-serialized template summaries and the
+          upstream project body spliced into the text content, and no deep conversion copy of
+          structured content for the large-payload tools
+
+It also times parsing of the index metadata and of a project body with stdlib json vs fast_json.
+
+    python bench_serialization.py --repeat 50 --project-pages 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import jsonschema
+import pydantic_core
+from fastmcp.tools.tool import ToolResult
+from mcp.types import CallToolResult, JSONRPCMessage, JSONRPCResponse, ServerResult, TextContent
+
+import fast_json
+import server
+from project_index import iter_project_elements
+from rag_search import live_index
+from section_index import get_section_index
+from stubs import synthetic_project
+
+
+def wire_bytes(result: ToolResult, output_schema) -> bytes:
+    """What the MCP server does with a ToolResult (mcp.server.lowlevel + shared.session)."""
+    content, structured = result.to_mcp_result()
+    if output_schema is not None:
+        jsonschema.validate(instance=structured, schema=output_schema)
+    response = ServerResult(CallToolResult(content=list(content), structuredContent=structured, isError=False))
+    message = JSONRPCMessage(JSONRPCResponse(jsonrpc="2.0", id=1,
+                                             result=response.model_dump(by_alias=True, mode="json", exclude_none=True)))
+    return message.model_dump_json(by_alias=True, exclude_none=True).encode("utf-8")
+
+
+def default_serializer(data) -> str:
+    """FastMCP's default tool serializer (fastmcp 2.10), which the server used before fast_json."""
+    return pydantic_core.to_json(data, fallback=str).decode()
+
+
+def as_tool_result(payload: dict, serializer) -> ToolResult:
+    """What FastMCP builds from a tool's dict return value: serialized text content + structured content."""
+    return ToolResult(content=[TextContent(type="text", text=serializer(payload))], structured_content=payload)
+
+
+def before(payload: dict) -> ToolResult:
+    return as_tool_result(payload, default_serializer)
+
+
+def after_plain(payload: dict) -> ToolResult:
+    return as_tool_result(payload, fast_json.dumps_str)
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def build_payloads(project: dict, project_body: bytes):
+    templates = live_index("ui_templates")["metadata"]
+    context = live_index("agent_context")["metadata"]
+    sections = get_section_index("agent_context")
+    fragments = server._preserialize_templates()
+    elements = [e for e, _, _ in iter_project_elements(project)][:50]
+
+    def templates_payload(k):
+        summary = [server._summarize_template(r) for r in templates[:k]]
+        answer = f"Found {len(summary)} relevant UI templates."
+        structured = {"answer": answer, "results": summary}
+        text_view = {"answer": answer, "results": [fragments[r["templateId"]] for r in templates[:k]]}
+        return structured, lambda: server._tool_result(structured, text_view)
+
+    payloads = {}
+    for k in (5, 50):
+        payloads[f"search_ui_templates(top_k={k})"] = templates_payload(k)
+    chunks = {"answer": "Found 5 relevant context chunks.",
+              "results": [server._summarize_context_chunk(dict(r, score=0.5)) for r in context[:5]]}
+    payloads["search_agent_design_context"] = (chunks, None)
+    largest = max(sections.anchors(), key=lambda a: sum(e - s for s, e in sections.ranges[a]))
+    section = {"answer": "Found 1 section(s).", "sections": sections.lookup(largest)}
+    payloads["get_agent_context_section"] = (section, None)
+    merged = {"answer": "Found 10 relevant results.", "results": [
+        {"corpus": "ui_templates", "similarity": 0.5, **server._summarize_template(r)} for r in templates[:4]
+    ] + [{"corpus": "agent_context", "similarity": 0.4, **server._summarize_context_chunk(r)} for r in context[:6]]}
+    payloads["search_all"] = (merged, None)
+    bulk = {"elements": {e["id"]: e for e in elements}, "errors": {}, "requested": 50, "fetched": 50}
+    payloads["get_ninjamock_project_elements(50)"] = (bulk, lambda: server._tool_result(bulk))
+    full = {"project": project}
+    payloads["get_ninjamock_project_full"] = (
+        full, lambda: server._tool_result(full, {"project": fast_json.fragment(project, project_body)}))
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--project-pages", type=int, default=20)
+    parser.add_argument("--project-elements", type=int, default=200)
+    args = parser.parse_args()
+
+    project = synthetic_project(pages=args.project_pages, elements_per_page=args.project_elements)
+    project_body = json.dumps(project).encode("utf-8")
+    schemas = {t.name: t.output_schema for t in asyncio.run(server.mcp.get_tools()).values()}
+
+    print(f"\n{'tool payload':>40} {'KB':>8} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, (payload, spliced) in build_payloads(project, project_body).items():
+        schema = schemas.get(name.split("(")[0])
+        make_after = spliced or (lambda p=payload: after_plain(p))
+        size = len(wire_bytes(before(payload), schema)) / 1024
+        t_before = timed(lambda: wire_bytes(before(payload), schema), args.repeat)
+        t_after = timed(lambda: wire_bytes(make_after(), schema), args.repeat)
+        print(f"{name:>40} {size:>8.0f} {t_before:>10.2f} {t_after:>10.2f} {t_before / t_after:>7.1f}x")
+
+    print(f"\n{'parse':>40} {'KB':>8} {'json ms':>10} {'fast ms':>10} {'speedup':>8}")
+    metadata_path = live_index("ui_templates")["metadata_path"]
+    with open(metadata_path, "rb") as f:
+        metadata_bytes = f.read()
+    for name, data in (("ui_templates metadata.json", metadata_bytes), ("project body", project_body)):
+        t_json = timed(lambda: json.loads(data), args.repeat)
+        t_fast = timed(lambda: fast_json.loads(data), args.repeat)
+        print(f"{name:>40} {len(data) / 1024:>8.0f} {t_json:>10.2f} {t_fast:>10.2f} {t_json / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
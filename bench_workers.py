@@ -0,0 +1,170 @@
+"""
+Throughput benchmark for the pre-fork multi-worker mode.
+
+Starts a local stub embedding server, then for each worker count launches `server.py --workers N`,
+waits for /ready and drives `search_agent_design_context` over streamable HTTP from client
+processes (each a pool of threads, so the load generator is not limited to one core's GIL).
+Reports requests/second and scaling relative to one worker, with the host's core count.
+
+The load is CPU-bound on purpose: the result cache is disabled, the stub answers with no
+latency and admission limits are lifted, so each call costs request handling, embedding
+decode, search and serialization in the server. Scaling beyond 1x needs as many free cores
+as workers (plus the client processes); on a single-core host every worker count shares one core.
+
+    python bench_workers.py --workers 1 2 4 --concurrency 32 --client-processes 4 --duration 10
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from stubs import StubEmbeddingServer
+
+MCP_HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+def call_tool(client: httpx.Client, url: str, tool: str, arguments: dict, request_id: int = 1, headers: dict = None) -> dict:
+    """Issue one stateless MCP tools/call and return the JSON-RPC response object."""
+    payload = {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": tool, "arguments": arguments}}
+    response = client.post(url, json=payload, headers={**MCP_HEADERS, **(headers or {})})
+    response.raise_for_status()
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        for line in response.text.splitlines():
+            if line.startswith("data:"):
+                return json.loads(line[5:])
+        raise ValueError("Empty event stream")
+    return response.json()
+
+
+def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Server at {base_url} did not become ready")
+
+
+def _drive_threads(url: str, concurrency: int, duration: float, offset: int, out):
+    counter = itertools.count(offset)
+    done, errors = [0], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        with httpx.Client(timeout=30) as client:
+            while time.monotonic() < deadline:
+                n = next(counter)
+                try:
+                    # Distinct queries so the result cache does not short-circuit the search
+                    reply = call_tool(client, url, "search_agent_design_context", {"query": f"button states {n}", "top_k": 5}, n)
+                    ok = "error" not in reply and not reply.get("result", {}).get("isError")
+                except Exception:
+                    ok = False
+                with lock:
+                    if ok:
+                        done[0] += 1
+                    else:
+                        errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out.put((done[0], errors[0], time.monotonic() - start))
+
+
+def drive(url: str, concurrency: int, duration: float, processes: int = 1) -> dict:
+    processes = max(1, min(processes, concurrency))
+    out = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_drive_threads,
+                                args=(url, concurrency // processes + (i < concurrency % processes), duration,
+                                      i * 10_000_000, out))
+        for i in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    parts = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    done = sum(p[0] for p in parts)
+    errors = sum(p[1] for p in parts)
+    elapsed = max(p[2] for p in parts)
+    return {"requests": done, "errors": errors, "seconds": round(elapsed, 2), "rps": round(done / elapsed, 1)}
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="seconds the stub embedding server waits per request (0 = CPU-bound server load)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    cores = available_cores()
+    print(f"cores available: {cores}, client processes: {args.client_processes}, stub latency: {args.stub_latency}s")
+    if max(args.workers) + args.client_processes > cores:
+        print(f"warning: {max(args.workers)} workers + {args.client_processes} client processes exceed {cores} cores; "
+              "worker scaling will be capped by the host")
+
+    results = []
+    with StubEmbeddingServer(latency=args.stub_latency) as stub:
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": stub.base_url,
+            "OPENAI_API_KEY": "stub",
+            "RAG_CACHE_MAX_ENTRIES": "0",
+            # One benchmark client must not be throttled as a single agent
+            "ADMISSION_CLIENT_RATE": "0",
+            "ADMISSION_CLIENT_CONCURRENT": str(args.concurrency),
+            "ADMISSION_MAX_CONCURRENT": str(args.concurrency),
+        }
+        for n in args.workers:
+            proc = subprocess.Popen(
+                [sys.executable, "server.py", "--workers", str(n), "--port", str(args.port), "--host", "127.0.0.1"],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                base_url = f"http://127.0.0.1:{args.port}"
+                wait_ready(base_url)
+                stats = drive(f"{base_url}/mcp/", args.concurrency, args.duration, args.client_processes)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            stats["workers"] = n
+            stats["cores"] = cores
+            results.append(stats)
+            print(json.dumps(stats))
+
+    base = results[0]["rps"] / results[0]["workers"] if results and results[0]["rps"] else None
+    print(f"\n{cores} core(s)\n{'workers':>8} {'rps':>10} {'errors':>8} {'scaling':>8}")
+    for r in results:
+        scaling = f"{r['rps'] / base:.2f}x" if base else "-"
+        print(f"{r['workers']:>8} {r['rps']:>10} {r['errors']:>8} {scaling:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,14 @@ import re
 import json
 from typing import List, Dict, Tuple
 
-import faiss
 import numpy as np
 import openai
 import tiktoken
 from dotenv import load_dotenv
 
+from index_reduction import REDUCTIONS, build_index
+from index_versions import publish_version
+
 # Config
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -17,9 +19,7 @@ EMBED_DIM = 1536
 
 SOURCE_PATH = "data/agent_context.md"
 OUT_DIR = "indices/agent_context"
-INDEX_PATH = os.path.join(OUT_DIR, "faiss_index.index")
-METADATA_JSON_PATH = os.path.join(OUT_DIR, "metadata.json")
-CHUNKS_JSONL_PATH = os.path.join(OUT_DIR, "chunks.jsonl")
+CHUNKS_JSONL_FILE = "chunks.jsonl"
 
 # Chunking params
 CHUNK_SIZE_TOKENS = 700  # target size ~500–800 tokens
@@ -199,29 +199,35 @@ def write_jsonl(path: str, rows: List[Dict]):
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
 
-def main():
+def main(dimensions: int = None, reduction: str = "matryoshka"):
     ensure_dir(OUT_DIR)
     md = read_markdown(SOURCE_PATH)
     chunks = build_chunks(md)
 
-    # Write JSONL for general pipelines
-    write_jsonl(CHUNKS_JSONL_PATH, chunks)
-
-    # Also write metadata.json (array) to be compatible with current rag_search
-    with open(METADATA_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(chunks, f, ensure_ascii=False, indent=2)
-
     # Build FAISS index
     texts = [c["text"] for c in chunks]
     if not texts:
         raise RuntimeError("No chunks produced from agent_context.md")
     print(f"Embedding {len(texts)} chunks from {SOURCE_PATH}...")
     vectors = embed_texts(texts)
-    index = faiss.IndexFlatL2(EMBED_DIM)
-    index.add(np.array(vectors).astype("float32"))
-    faiss.write_index(index, INDEX_PATH)
-    print(f"Wrote index: {INDEX_PATH}\nMetadata JSON: {METADATA_JSON_PATH}\nChunks JSONL: {CHUNKS_JSONL_PATH}")
+    index, reduced = build_index(np.array(vectors).astype("float32"), dimensions, reduction)
+
+    # Publish index + metadata.json (array, for rag_search) + chunks.jsonl (for general pipelines)
+    # as a new version; the running server swaps it in once it is complete
+    version = publish_version(
+        OUT_DIR,
+        index,
+        chunks,
+        embedder={"model": MODEL, **reduced},
+        extra_files={CHUNKS_JSONL_FILE: lambda path: write_jsonl(path, chunks)},
+    )
+    print(f"Published version {version} of {OUT_DIR} ({index.ntotal} vectors, {reduced['dimensions']} dims)")
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the agent_context FAISS index")
+    parser.add_argument("--dimensions", type=int, default=None, help=f"reduce from {EMBED_DIM} to this many dimensions")
+    parser.add_argument("--reduction", choices=REDUCTIONS, default="matryoshka")
+    args = parser.parse_args()
+    main(args.dimensions, args.reduction)
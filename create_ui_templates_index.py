@@ -1,11 +1,13 @@
 import json
-import faiss
 import numpy as np
 import openai
 import tiktoken
 import os
 from dotenv import load_dotenv
 
+from index_reduction import REDUCTIONS, build_index
+from index_versions import publish_version
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 MODEL = "text-embedding-3-small"
@@ -13,8 +15,6 @@ EMBED_DIM = 1536
 
 UI_TEMPLATES_PATH = "data/ui_templates.json"
 INDEX_DIR = "indices/ui_templates/"
-INDEX_PATH = os.path.join(INDEX_DIR, "faiss_index.index")
-METADATA_PATH = os.path.join(INDEX_DIR, "metadata.json")
 
 def load_ui_templates(json_file=UI_TEMPLATES_PATH):
     with open(json_file, "r", encoding="utf-8") as file:
@@ -64,7 +64,7 @@ def embed_text(texts, model=MODEL):
         embeddings.extend(batch_embeddings)
     return embeddings
 
-def build_ui_templates_index(templates):
+def build_ui_templates_index(templates, dimensions=None, reduction="matryoshka"):
     all_texts = []
     metadata = []
     for template in templates:
@@ -87,14 +87,16 @@ def build_ui_templates_index(templates):
     print("Embedding templates...")
     embeddings = embed_text(all_texts)
     print("Creating FAISS index...")
-    index = faiss.IndexFlatL2(EMBED_DIM)
-    index.add(np.array(embeddings).astype('float32'))
-    faiss.write_index(index, INDEX_PATH)
-    with open(METADATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=4)
-    print(f"Index and metadata saved in {INDEX_DIR}")
+    index, reduced = build_index(np.array(embeddings).astype('float32'), dimensions, reduction)
+    version = publish_version(INDEX_DIR, index, metadata, embedder={"model": MODEL, **reduced})
+    print(f"Index and metadata published as version {version} in {INDEX_DIR} ({reduced['dimensions']} dims)")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the UI templates FAISS index")
+    parser.add_argument("--dimensions", type=int, default=None, help=f"reduce from {EMBED_DIM} to this many dimensions")
+    parser.add_argument("--reduction", choices=REDUCTIONS, default="matryoshka")
+    args = parser.parse_args()
     templates = load_ui_templates()
-    build_ui_templates_index(templates)
+    build_ui_templates_index(templates, args.dimensions, args.reduction)
     print("UI templates indexing completed.")
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+# Queries arriving within this window are sent to the API as one request
+BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+# A batch is dispatched immediately once it holds this many distinct queries
+BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+# Request errors caused by the request itself rather than its input; retrying halves would not help
+_NOT_INPUT_ERRORS = {401, 403, 404, 408, 409, 429}
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent single-query embedding requests into batched API calls.
+
+    `embed_many` is a blocking function (texts -> list of vectors) and is run in a worker thread.
+    The first query of a batch starts the window timer; the batch is flushed when the window
+    elapses or `max_size` distinct texts are pending, and each caller gets its own vector back.
+    When the API rejects a batch because of its input, the batch is bisected and retried so only
+    the callers of the offending texts get the error.
+    """
+
+    def __init__(self, embed_many: Callable[[List[str]], List[np.ndarray]],
+                 window_ms: float = BATCH_WINDOW_MS, max_size: int = BATCH_MAX_SIZE):
+        self.embed_many = embed_many
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_size = max(1, max_size)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The event loop only keeps weak references to tasks; hold dispatches until they finish
+        self._dispatching: Set[asyncio.Task] = set()
+        self.stats = {"queries": 0, "batches": 0, "largest_batch": 0, "split_batches": 0}
+
+    async def embed(self, text: str) -> np.ndarray:
+        self.stats["queries"] += 1
+        future = self._pending.get(text)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[text] = future
+            if len(self._pending) >= self.max_size or not self.window:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: Dict[str, asyncio.Future]):
+        texts = list(batch)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(texts))
+        try:
+            vectors = await asyncio.to_thread(self.embed_many, texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding API returned {len(vectors)} vectors for {len(texts)} inputs")
+        except Exception as e:
+            if len(texts) > 1 and _rejected_input(e):
+                self.stats["split_batches"] += 1
+                middle = len(texts) // 2
+                await asyncio.gather(self._dispatch({t: batch[t] for t in texts[:middle]}),
+                                     self._dispatch({t: batch[t] for t in texts[middle:]}))
+                return
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Waiters may have been cancelled; avoid "exception never retrieved" noise
+                    future.exception()
+            return
+        for text, vector in zip(texts, vectors):
+            if not batch[text].done():
+                batch[text].set_result(vector)
+
+    def snapshot(self) -> Dict:
+        return {"pending": len(self._pending), "dispatching": len(self._dispatching), "window_ms": self.window * 1000, "max_size": self.max_size, **self.stats}
+
+
+def _rejected_input(error: Exception) -> bool:
+    """True for a 4xx API error that can be caused by one of the inputs (e.g. an empty or over-long text)."""
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in _NOT_INPUT_ERRORS
@@ -0,0 +1,36 @@
+from typing import Any
+
+import orjson
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def loads(data) -> Any:
+    """Parse JSON from bytes or str."""
+    return orjson.loads(data)
+
+
+def load_file(path: str) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dumps(obj) -> bytes:
+    """
+    Compact UTF-8 JSON. Values that are not JSON types are written as str(), like FastMCP's
+    default tool serializer; pre-serialized values from `fragment` are spliced in as-is.
+    """
+    return orjson.dumps(obj, default=str, option=_ORJSON_OPTIONS)
+
+
+def dumps_str(obj) -> str:
+    """Tool result serializer for FastMCP (text content of every tool response)."""
+    return dumps(obj).decode("utf-8")
+
+
+def fragment(value, serialized: bytes = None):
+    """
+    Pre-serialized stand-in for `value` to embed in a payload passed to `dumps`, which then copies
+    the bytes instead of walking the value again. `serialized` defaults to dumps(value).
+    """
+    return orjson.Fragment(dumps(value) if serialized is None else serialized)
@@ -0,0 +1,72 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+REDUCTIONS = ("matryoshka", "pca")
+
+
+def truncate_normalize(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """
+    Matryoshka reduction: keep the first `dims` components and re-normalize to unit length.
+    This is what the embeddings API returns for text-embedding-3-* with `dimensions=dims`.
+    """
+    v = np.ascontiguousarray(np.asarray(vectors, dtype="float32")[..., :dims])
+    norms = np.linalg.norm(v, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return v / norms
+
+
+def fit_query_vector(index, query_vector: np.ndarray) -> np.ndarray:
+    """
+    Adapt a full-size query embedding to an index. Flat indices narrower than the query were
+    built with Matryoshka truncation; PCA indices carry their own pre-transform and take the
+    full vector unchanged.
+    """
+    if query_vector.shape[-1] > index.d:
+        return truncate_normalize(query_vector, index.d)
+    return query_vector
+
+
+def build_index(vectors: np.ndarray, dims: Optional[int] = None, reduction: str = "matryoshka") -> Tuple[object, Dict]:
+    """
+    Build an exact L2 index over full-size embeddings, optionally reduced to `dims` dimensions.
+
+    - matryoshka: vectors are truncated + re-normalized (queries are truncated the same way at search time)
+    - pca: a PCA transform followed by L2 normalization is trained on the corpus and stored in the
+      index (IndexPreTransform), so faiss applies it to queries automatically. Similarities stay in
+      the cosine range but are measured in the centered PCA subspace, which drops the part of the
+      query outside it, so they run higher than full-size cosine scores and are marked not comparable
+
+    Returns (index, reduction info for the manifest's embedder block).
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(np.asarray(vectors, dtype="float32"))
+    full = vectors.shape[1]
+    if not dims or dims >= full:
+        index = faiss.IndexFlatL2(full)
+        index.add(vectors)
+        return index, {"dimensions": full, "reduction": None}
+    if reduction == "matryoshka":
+        index = faiss.IndexFlatL2(dims)
+        index.add(truncate_normalize(vectors, dims))
+    elif reduction == "pca":
+        pca = faiss.PCAMatrix(full, dims)
+        pca.train(vectors)
+        normalized = faiss.IndexPreTransform(faiss.NormalizationTransform(dims, 2.0), faiss.IndexFlatL2(dims))
+        index = faiss.IndexPreTransform(pca, normalized)
+        index.add(vectors)
+    else:
+        raise ValueError(f"Unknown reduction {reduction!r}; expected one of {REDUCTIONS}")
+    return index, {"dimensions": dims, "source_dimensions": full, "reduction": reduction,
+                   "comparable_similarity": reduction != "pca"}
+
+
+def comparable_similarity(manifest: Optional[Dict]) -> bool:
+    """
+    Whether an index's similarities are on the same cosine scale as full-size indices (see build_index).
+    Legacy layouts without a manifest are full-size; manifests written before the flag existed fall back
+    to the reduction.
+    """
+    embedder = (manifest or {}).get("embedder") or {}
+    return embedder.get("comparable_similarity", embedder.get("reduction") != "pca")
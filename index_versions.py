@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import fast_json
+
+# Layout of a versioned index directory:
+#   <index_dir>/versions/<version>/faiss_index.index
+#   <index_dir>/versions/<version>/metadata.json
+#   <index_dir>/versions/<version>/manifest.json   (written last)
+#   <index_dir>/CURRENT                            (name of the live version, replaced atomically)
+# Directories without CURRENT fall back to the legacy flat files in <index_dir>.
+POINTER_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "faiss_index.index"
+METADATA_FILE = "metadata.json"
+VERSIONS_DIR = "versions"
+KEEP_VERSIONS = 3
+
+
+def new_version_id() -> str:
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + "-" + uuid.uuid4().hex[:6]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write_text(path: str, text: str):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_current(index_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(index_dir, POINTER_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(index_dir: str, version: str) -> str:
+    return os.path.join(index_dir, VERSIONS_DIR, version)
+
+
+def resolve(index_dir: str) -> Dict:
+    """
+    Paths of the live version of an index directory:
+    {"version", "dir", "index_path", "metadata_path"}; version is None for legacy flat layouts.
+    """
+    version = read_current(index_dir)
+    base = version_dir(index_dir, version) if version else index_dir
+    return {
+        "version": version,
+        "dir": base,
+        "index_path": os.path.join(base, INDEX_FILE),
+        "metadata_path": os.path.join(base, METADATA_FILE),
+    }
+
+
+def load_manifest(base_dir: str) -> Optional[Dict]:
+    try:
+        return fast_json.load_file(os.path.join(base_dir, MANIFEST_FILE))
+    except FileNotFoundError:
+        return None
+
+
+def verify_version(base_dir: str, index, metadata) -> Optional[Dict]:
+    """
+    Check a loaded (index, metadata) pair against its manifest and against each other.
+    Raises ValueError on any mismatch; returns the manifest (None for legacy layouts).
+    """
+    if index.ntotal != len(metadata):
+        raise ValueError(f"{base_dir}: index has {index.ntotal} vectors but metadata has {len(metadata)} rows")
+    manifest = load_manifest(base_dir)
+    if manifest is None:
+        return None
+    if manifest.get("vector_count") != index.ntotal or manifest.get("dims") != index.d:
+        raise ValueError(f"{base_dir}: manifest expects {manifest.get('vector_count')} x {manifest.get('dims')}, "
+                         f"index is {index.ntotal} x {index.d}")
+    for name, info in manifest.get("files", {}).items():
+        if file_sha256(os.path.join(base_dir, name)) != info["sha256"]:
+            raise ValueError(f"{base_dir}: checksum mismatch for {name}")
+    return manifest
+
+
+def publish_version(index_dir: str, index, metadata: List, embedder: Dict,
+                    extra_files: Optional[Dict[str, Callable[[str], None]]] = None,
+                    keep: int = KEEP_VERSIONS) -> str:
+    """
+    Write a new immutable index version and make it live.
+
+    Files go into a fresh versions/<id> directory that nothing reads yet; the manifest (vector count,
+    dims, embedder, checksums) is written last, and only then is CURRENT atomically replaced.
+    `extra_files` maps file names to writer callbacks (e.g. chunks.jsonl). Old versions beyond
+    `keep` are pruned. Returns the new version id.
+    """
+    import faiss
+
+    if index.ntotal != len(metadata):
+        raise ValueError(f"Refusing to publish: {index.ntotal} vectors vs {len(metadata)} metadata rows")
+    version = new_version_id()
+    base = version_dir(index_dir, version)
+    os.makedirs(base)
+
+    faiss.write_index(index, os.path.join(base, INDEX_FILE))
+    with open(os.path.join(base, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    for name, writer in (extra_files or {}).items():
+        writer(os.path.join(base, name))
+
+    files = {}
+    for name in sorted(os.listdir(base)):
+        path = os.path.join(base, name)
+        files[name] = {"sha256": file_sha256(path), "size": os.path.getsize(path)}
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "vector_count": int(index.ntotal),
+        "dims": int(index.d),
+        "embedder": embedder,
+        "files": files,
+    }
+    _atomic_write_text(os.path.join(base, MANIFEST_FILE), json.dumps(manifest, indent=2))
+    _atomic_write_text(os.path.join(index_dir, POINTER_FILE), version + "\n")
+    prune_versions(index_dir, keep)
+    return version
+
+
+def prune_versions(index_dir: str, keep: int = KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions (never the live one)."""
+    root = os.path.join(index_dir, VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return
+    current = read_current(index_dir)
+    versions = sorted(os.listdir(root), reverse=True)
+    for version in versions[max(1, keep):]:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
@@ -0,0 +1,148 @@
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+import ijson
+
+import fast_json
+
+STREAM_READ_SIZE = 256 * 1024
+
+
+def parse_pointer(pointer: Optional[str]) -> List[str]:
+    """Split an RFC 6901 JSON pointer ("/pages/0/elements") into unescaped reference tokens."""
+    if not pointer or pointer == "/":
+        return []
+    if not pointer.startswith("/"):
+        pointer = "/" + pointer
+    return [p.replace("~1", "/").replace("~0", "~") for p in pointer.split("/")[1:]]
+
+
+def format_pointer(tokens: List[str]) -> str:
+    return "".join("/" + t.replace("~", "~0").replace("/", "~1") for t in tokens)
+
+
+def _truncated(value) -> dict:
+    return {"truncated": True, "type": "array" if isinstance(value, list) else "object"}
+
+
+def project_value(value, pointer=None, max_depth: Optional[int] = None,
+                  fields: Optional[Iterable[str]] = None):
+    """
+    Apply a projection to an already-parsed JSON value.
+
+    - pointer: JSON pointer (or list of tokens) to the subtree to return; LookupError if missing
+    - max_depth: containers nested deeper than this are replaced by {"truncated": True, ...}
+    - fields: if given, objects (at every level) keep only these keys
+    """
+    if isinstance(pointer, list):
+        pointer = format_pointer(pointer)
+    for part in parse_pointer(pointer):
+        if isinstance(value, list):
+            try:
+                value = value[int(part)]
+            except (ValueError, IndexError):
+                raise LookupError(f"JSON pointer {pointer!r} not found")
+        elif isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            raise LookupError(f"JSON pointer {pointer!r} not found")
+    keep = set(fields) if fields else None
+
+    def walk(v, depth):
+        if isinstance(v, (dict, list)) and max_depth is not None and depth > max_depth:
+            return _truncated(v)
+        if isinstance(v, dict):
+            return {k: walk(c, depth + 1) for k, c in v.items() if keep is None or k in keep}
+        if isinstance(v, list):
+            return [walk(c, depth + 1) for c in v]
+        return v
+
+    if keep is None and max_depth is None:
+        return value
+    return walk(value, 0)
+
+
+class _AsyncChunkReader:
+    """
+    Adapts an async byte iterator to the `async read(n)` interface ijson expects.
+    With keep=True the bytes read so far are retained so the document can be re-parsed.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], keep: bool = False):
+        self._chunks = chunks
+        self._buffer = b""
+        self._offset = 0
+        self.kept: Optional[List[bytes]] = [] if keep else None
+
+    async def read(self, n: int = -1) -> bytes:
+        # Hand out at most n bytes: a single decompressed chunk can be several MB, and ijson
+        # turns each read into one batch of parse events
+        while self._offset >= len(self._buffer):
+            try:
+                self._buffer, self._offset = await self._chunks.__anext__(), 0
+            except StopAsyncIteration:
+                return b""
+            if self.kept is not None:
+                self.kept.append(self._buffer)
+        if n is None or n < 0:
+            n = len(self._buffer)
+        start, self._offset = self._offset, self._offset + n
+        return self._buffer[start:self._offset]
+
+    async def read_all(self) -> bytes:
+        """Everything read so far plus the rest of the stream (requires keep=True)."""
+        while await self.read(STREAM_READ_SIZE):
+            pass
+        return b"".join(self.kept)
+
+
+def _ijson_prefix(tokens: List[str]) -> Optional[Tuple[str, int, List[str]]]:
+    """
+    Map pointer tokens to (ijson prefix, item index, remaining tokens).
+
+    ijson matches every array item with "item", so the first numeric token becomes "item" and
+    the wanted position is counted while streaming; the rest of the pointer is resolved on the
+    materialized item. Returns None when a key contains "." or is literally "item" (ambiguous in
+    ijson prefixes, where "item" would match array elements).
+    """
+    if any("." in t or t == "item" for t in tokens):
+        return None
+    prefix: List[str] = []
+    for i, token in enumerate(tokens):
+        if token.isdigit():
+            return ".".join(prefix + ["item"]), int(token), tokens[i + 1:]
+        prefix.append(token)
+    return ".".join(prefix), 0, []
+
+
+async def project_stream(chunks: AsyncIterator[bytes], pointer: Optional[str] = None,
+                         max_depth: Optional[int] = None, fields: Optional[Iterable[str]] = None):
+    """
+    Incrementally parse a JSON byte stream and return only the projected part.
+
+    With a pointer, values outside it are parsed by ijson's C backend without being kept,
+    siblings before the wanted array item are built and dropped one at a time, and reading stops
+    as soon as the target has been produced. Without one the whole body is needed anyway and is
+    parsed in one go; max_depth and fields then only shrink the result, not the parse.
+    """
+    tokens = parse_pointer(pointer)
+    target = _ijson_prefix(tokens) if tokens else None
+    if target is None:
+        # Nothing to skip: the whole document is needed, and a one-shot parse builds it fastest
+        body = b"".join([chunk async for chunk in chunks])
+        return project_value(fast_json.loads(body), tokens, max_depth, fields)
+
+    prefix, index, rest = target
+    # A numeric token is streamed as an array position. If the container turns out to be an
+    # object with numeric keys ({"0": ...}) no item matches, so the body is kept until the first
+    # item shows it is an array, and otherwise resolved with project_value
+    numeric = any(t.isdigit() for t in tokens)
+    reader = _AsyncChunkReader(chunks, keep=numeric)
+    position = 0
+    async for item in ijson.items_async(reader, prefix, use_float=True, buf_size=STREAM_READ_SIZE):
+        if position == index:
+            return project_value(item, rest, max_depth, fields)
+        position += 1
+        reader.kept = None
+    if reader.kept is not None:
+        return project_value(fast_json.loads(await reader.read_all()), tokens, max_depth, fields)
+    raise LookupError(f"JSON pointer {pointer!r} not found")
@@ -0,0 +1,343 @@
+"""
+End-to-end load generator for the MCP server, runnable fully offline.
+
+Starts local stand-ins for the OpenAI embeddings API and plugins.ninjamock.com (configurable
+latency, error rate and project size), launches `server.py` against them (or targets --url),
+and drives the streamable-HTTP endpoint with a weighted mix of tool calls at a target
+concurrency and, optionally, a target request rate. Reports throughput, latency percentiles
+and error rates per tool. The stubs run in a child process so their JSON and embedding work does
+not compete with the driver for the GIL. With --rps, latency is measured from each request's
+scheduled start, so time spent waiting for a free worker counts (no coordinated omission).
+
+    python loadgen.py --duration 30 --concurrency 32 --rps 200
+    python loadgen.py --mix search_all=5,get_ninjamock_project_full=1 --ninjamock-latency 0.05
+    python loadgen.py --url http://127.0.0.1:8000 --duration 60   # existing server; its upstreams are used as-is
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench_workers import MCP_HEADERS, wait_ready
+from stubs import StubEmbeddingServer, StubNinjamockServer, synthetic_project
+
+DEFAULT_MIX = {
+    "search_ui_templates": 25,
+    "search_agent_design_context": 25,
+    "search_ninjamock_docs": 10,
+    "search_all": 10,
+    "get_ninjamock_project_metadata": 10,
+    "get_ninjamock_project_element_by_id": 10,
+    "get_ninjamock_project_elements": 5,
+    "get_ninjamock_project_full": 5,
+    "search_project_elements": 5,
+    "get_agent_context_section": 5,
+}
+
+QUERIES = [
+    "login form", "primary button states", "navigation bar", "tabs container", "text input with label",
+    "checkbox", "dropdown select", "modal dialog", "card with image", "how to share a project",
+    "export to png", "color tokens", "spacing scale", "typography sizes", "icon button",
+    "list with avatars", "table layout", "toggle switch", "date picker", "progress bar",
+    "how to create a website", "templated element vs inline", "element properties", "page layout grid",
+]
+
+
+class ToolCallError(Exception):
+    pass
+
+
+async def call_tool_async(client: httpx.AsyncClient, url: str, tool: str, arguments: dict,
+                          request_id: int, headers: Optional[dict] = None) -> dict:
+    """Stateless MCP tools/call; raises ToolCallError for protocol or tool-level errors."""
+    payload = {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": tool, "arguments": arguments}}
+    response = await client.post(url, json=payload, headers={**MCP_HEADERS, **(headers or {})})
+    if response.status_code != 200:
+        raise ToolCallError(f"HTTP {response.status_code}")
+    reply = None
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        for line in response.text.splitlines():
+            if line.startswith("data:"):
+                reply = json.loads(line[5:])
+                break
+    else:
+        reply = response.json()
+    if reply is None:
+        raise ToolCallError("empty response")
+    if "error" in reply:
+        raise ToolCallError(reply["error"].get("message", "JSON-RPC error"))
+    result = reply.get("result", {})
+    structured = result.get("structuredContent") or {}
+    if result.get("isError"):
+        # Tool errors (e.g. admission rejections) carry their details as text, JSON where possible
+        text = "".join(c.get("text", "") for c in result.get("content", []))
+        try:
+            structured = json.loads(text)
+        except ValueError:
+            structured = None
+        if not isinstance(structured, dict):
+            structured = {"error": text}
+    if result.get("isError") or structured.get("error"):
+        # Group upstream failures by status rather than by URL
+        raise ToolCallError(structured.get("reason") or str(structured.get("error") or "tool error").split(" for url ")[0][:80])
+    return result
+
+
+# Anchors of agent_context sections (see indices/agent_context/chunks.jsonl)
+ANCHORS = ["overview", "element-types-catalogue", "templateid-template-metadata-mapping", "property-value-examples",
+           "flexbox-layout-properties", "templates-vs-direct-elements"]
+
+
+def make_arguments(tool: str, rng: random.Random, element_ids: List[str], unique_ratio: float) -> dict:
+    query = rng.choice(QUERIES)
+    if rng.random() < unique_ratio:
+        query = f"{query} {rng.randrange(10**6)}"
+    project_id = f"project-{rng.randrange(5)}"
+    if tool in ("search_ui_templates", "search_agent_design_context"):
+        return {"query": query, "top_k": rng.choice([3, 5, 10])}
+    if tool == "search_ninjamock_docs":
+        return {"query": query}
+    if tool == "search_all":
+        return {"query": query, "top_k": 10}
+    if tool == "get_ninjamock_project_metadata":
+        return {"project_id": project_id}
+    if tool == "get_ninjamock_project_element_by_id":
+        return {"project_id": project_id, "element_id": rng.choice(element_ids)}
+    if tool == "get_ninjamock_project_elements":
+        return {"project_id": project_id, "element_ids": rng.sample(element_ids, min(10, len(element_ids)))}
+    if tool == "get_ninjamock_project_full":
+        return {"project_id": project_id, "pointer": f"/pages/{rng.randrange(3)}", "max_depth": 3}
+    if tool == "search_project_elements":
+        return {"project_id": project_id, "query": query, "top_k": 5}
+    if tool == "get_agent_context_section":
+        return {"anchor": rng.choice(ANCHORS)}
+    return {}
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def drive(url: str, mix: Dict[str, int], concurrency: int, duration: float, rps: Optional[float],
+                element_ids: List[str], clients: int, unique_ratio: float, seed: int) -> Dict:
+    rng = random.Random(seed)
+    tools, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    counter = iter(range(1, 1 << 62))
+    deadline = time.perf_counter() + duration
+    pace = {"next": time.perf_counter(), "issued": 0, "missed": 0, "max_lag": 0.0}
+
+    def take_slot() -> float:
+        # Open-loop pacing: start times are fixed 1/rps apart across all workers and never slip,
+        # so a backlog shows up as lag (and latency) instead of silently lowering the rate
+        slot = pace["next"]
+        pace["next"] = slot + 1.0 / rps
+        return slot
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            if rps:
+                slot = take_slot()
+                await asyncio.sleep(max(0.0, slot - time.perf_counter()))
+                if slot >= deadline or time.perf_counter() >= deadline:
+                    return
+                lag = time.perf_counter() - slot
+                pace["issued"] += 1
+                pace["max_lag"] = max(pace["max_lag"], lag)
+                if lag > 1.0 / rps:
+                    # No worker was free when this request was due
+                    pace["missed"] += 1
+            elif time.perf_counter() >= deadline:
+                return
+            tool = rng.choices(tools, weights)[0]
+            arguments = make_arguments(tool, rng, element_ids, unique_ratio)
+            # Several simulated agents, each with its own token
+            headers = {"authorization": f"Bearer loadgen-client-{rng.randrange(clients)}"}
+            start = slot if rps else time.perf_counter()
+            try:
+                await call_tool_async(client, url, tool, arguments, next(counter), headers)
+                latencies[tool].append(time.perf_counter() - start)
+            except (ToolCallError, httpx.HTTPError) as e:
+                errors[tool][str(e) or type(e).__name__] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        start = time.monotonic()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.monotonic() - start
+
+    report = {"seconds": round(elapsed, 2), "tools": {}}
+    for tool in tools:
+        ok, failed = latencies.get(tool, []), sum(errors.get(tool, {}).values())
+        total = len(ok) + failed
+        if not total:
+            continue
+        report["tools"][tool] = {
+            "calls": total,
+            "rps": round(len(ok) / elapsed, 1),
+            "error_rate": round(failed / total, 4),
+            "p50_ms": round(percentile(ok, 50) * 1000, 1),
+            "p90_ms": round(percentile(ok, 90) * 1000, 1),
+            "p99_ms": round(percentile(ok, 99) * 1000, 1),
+            "max_ms": round(max(ok, default=0) * 1000, 1),
+            "errors": dict(errors.get(tool, {})),
+        }
+    all_ok = [v for tool in tools for v in latencies.get(tool, [])]
+    all_failed = sum(sum(e.values()) for e in errors.values())
+    report["total"] = {
+        "calls": len(all_ok) + all_failed,
+        "rps": round(len(all_ok) / elapsed, 1),
+        "error_rate": round(all_failed / max(1, len(all_ok) + all_failed), 4),
+        "p50_ms": round(percentile(all_ok, 50) * 1000, 1),
+        "p99_ms": round(percentile(all_ok, 99) * 1000, 1),
+    }
+    if rps:
+        report["pacing"] = {
+            "target_rps": rps,
+            "achieved_rps": round(pace["issued"] / elapsed, 1),
+            "missed_slots": pace["missed"],
+            "max_lag_ms": round(pace["max_lag"] * 1000, 1),
+        }
+    return report
+
+
+def print_report(report: Dict):
+    print(f"\n{'tool':>36} {'calls':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for tool, r in list(report["tools"].items()) + [("TOTAL", report["total"])]:
+        print(f"{tool:>36} {r['calls']:>7} {r['rps']:>8} {r['error_rate'] * 100:>6.2f} {r['p50_ms']:>8} "
+              f"{r.get('p90_ms', ''):>8} {r['p99_ms']:>8} {r.get('max_ms', ''):>8}")
+    for tool, r in report["tools"].items():
+        for message, count in r["errors"].items():
+            print(f"  {tool}: {count} x {message}")
+    pacing = report.get("pacing")
+    if pacing:
+        print(f"\npacing: {pacing['achieved_rps']} of {pacing['target_rps']} rps sent, "
+              f"{pacing['missed_slots']} slots started late (max lag {pacing['max_lag_ms']} ms)")
+
+
+def _serve_stubs(conn, project_args: dict, embed_args: dict, ninjamock_args: dict):
+    project = synthetic_project(**project_args)
+    with StubEmbeddingServer(**embed_args) as embed_stub, StubNinjamockServer(project, **ninjamock_args) as nm_stub:
+        conn.send({"embedding_url": embed_stub.base_url, "ninjamock_url": nm_stub.base_url,
+                   "element_ids": list(nm_stub.elements)})
+        conn.recv()
+        conn.send({"embedding_requests": embed_stub.requests, "embedded_inputs": embed_stub.inputs,
+                   "ninjamock_requests": nm_stub.requests})
+
+
+class StubProcess:
+    """Embedding and Ninjamock stubs served from a child process; `stop()` returns their request counts."""
+
+    def __init__(self, project_args: dict, embed_args: dict, ninjamock_args: dict):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_stubs, args=(child, project_args, embed_args, ninjamock_args),
+                                                daemon=True)
+        self.counts = None
+
+    def start(self):
+        self._process.start()
+        info = self._conn.recv()
+        self.embedding_url, self.ninjamock_url = info["embedding_url"], info["ninjamock_url"]
+        self.element_ids = info["element_ids"]
+        return self
+
+    def stop(self) -> dict:
+        if self.counts is None and self._process.is_alive():
+            self._conn.send("stop")
+            self.counts = self._conn.recv()
+            self._process.join(timeout=10)
+        return self.counts
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of an already running server (skips stubs and launch)")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rps", type=float, default=None, help="target request rate (default: closed loop, as fast as possible)")
+    parser.add_argument("--mix", help="tool=weight,... (default: a search-heavy agent mix)")
+    parser.add_argument("--clients", type=int, default=8, help="distinct auth tokens to spread calls over")
+    parser.add_argument("--unique-ratio", type=float, default=0.5, help="fraction of queries made unique (cache misses)")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--embed-latency", type=float, default=0.03)
+    parser.add_argument("--embed-error-rate", type=float, default=0.0)
+    parser.add_argument("--ninjamock-latency", type=float, default=0.02)
+    parser.add_argument("--ninjamock-error-rate", type=float, default=0.0)
+    parser.add_argument("--project-pages", type=int, default=10)
+    parser.add_argument("--project-elements", type=int, default=200, help="elements per page of the synthetic project")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    stubs = StubProcess(
+        project_args={"pages": args.project_pages, "elements_per_page": args.project_elements},
+        embed_args={"latency": args.embed_latency, "error_rate": args.embed_error_rate, "seed": args.seed},
+        ninjamock_args={"latency": args.ninjamock_latency, "error_rate": args.ninjamock_error_rate, "seed": args.seed},
+    )
+    with stubs:
+        proc = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            env = {
+                **os.environ,
+                "OPENAI_BASE_URL": stubs.embedding_url,
+                "OPENAI_API_KEY": "loadgen",
+                "NINJAMOCK_BASE_URL": stubs.ninjamock_url,
+            }
+            proc = subprocess.Popen(
+                [sys.executable, "server.py", "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers)],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_ready(base_url)
+            report = asyncio.run(drive(f"{base_url}/mcp/", mix, args.concurrency, args.duration, args.rps,
+                                       stubs.element_ids, args.clients, args.unique_ratio, args.seed))
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait(timeout=30)
+        report["upstream"] = stubs.stop()
+        report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+
+    print_report(report)
+    print(f"\nupstream: {report['upstream']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
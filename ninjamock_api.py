@@ -0,0 +1,114 @@
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional
+
+import httpx
+
+import fast_json
+import json_projection
+from singleflight import SingleFlight, token_fingerprint
+
+BASE_URL = os.getenv("NINJAMOCK_BASE_URL", "https://plugins.ninjamock.com")
+
+# One pooled client per process (created lazily so pre-forked workers each get their own)
+_client_lock = threading.Lock()
+_client: Optional[httpx.AsyncClient] = None
+
+# Upper bound on concurrent upstream requests issued by one bulk call
+BULK_CONCURRENCY = int(os.getenv("NINJAMOCK_BULK_CONCURRENCY", "8"))
+
+upstream_flight = SingleFlight("ninjamock")
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.AsyncClient(
+                    base_url=BASE_URL,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                )
+    return _client
+
+
+async def _get_json(path: str, headers: Dict[str, str], timeout: float):
+    response = await get_client().get(path, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return fast_json.loads(response.content)
+
+
+async def get_json(path: str, headers: Dict[str, str], timeout: float = 5):
+    """
+    GET a Ninjamock API path and return the parsed JSON body.
+    Concurrent identical requests (same token and path) share one upstream call.
+    """
+    key = (token_fingerprint(headers), path)
+    return await upstream_flight.do(key, lambda: _get_json(path, headers, timeout))
+
+
+async def _get_json_with_body(path: str, headers: Dict[str, str], timeout: float):
+    response = await get_client().get(path, headers={**headers, "Accept-Encoding": "gzip, deflate"}, timeout=timeout)
+    response.raise_for_status()
+    return fast_json.loads(response.content), response.content
+
+
+async def get_json_with_body(path: str, headers: Dict[str, str], timeout: float = 10):
+    """
+    Like get_json, but returns (parsed JSON, raw body bytes) so a response can embed the upstream
+    document as-is instead of serializing it again.
+    """
+    key = (token_fingerprint(headers), path, "with_body")
+    return await upstream_flight.do(key, lambda: _get_json_with_body(path, headers, timeout))
+
+
+async def _get_json_projected(path: str, headers: Dict[str, str], timeout: float, pointer: Optional[str],
+                              max_depth: Optional[int], fields: Optional[List[str]]):
+    # httpx transparently decodes gzip/deflate, so the compressed body is streamed and inflated chunk by chunk
+    request_headers = {**headers, "Accept-Encoding": "gzip, deflate"}
+    async with get_client().stream("GET", path, headers=request_headers, timeout=timeout) as response:
+        response.raise_for_status()
+        return await json_projection.project_stream(response.aiter_bytes(), pointer, max_depth, fields)
+
+
+async def get_json_projected(path: str, headers: Dict[str, str], timeout: float = 10, pointer: Optional[str] = None,
+                             max_depth: Optional[int] = None, fields: Optional[List[str]] = None):
+    """
+    Stream a (potentially large) Ninjamock JSON document and return only the requested part:
+    the subtree at JSON `pointer`, cut at `max_depth` and restricted to `fields`.
+    Concurrent identical requests share one upstream call.
+    """
+    key = (token_fingerprint(headers), path, pointer or "", max_depth, tuple(sorted(fields)) if fields else None)
+    return await upstream_flight.do(key, lambda: _get_json_projected(path, headers, timeout, pointer, max_depth, fields))
+
+
+async def get_many_json(paths: List[str], headers: Dict[str, str], timeout: float = 5,
+                        concurrency: int = BULK_CONCURRENCY, deadline: Optional[float] = None) -> Dict[str, object]:
+    """
+    GET several API paths concurrently (at most `concurrency` in flight) over the pooled client.
+
+    Returns {path: parsed JSON or Exception}; one failing path never fails the others. Paths still
+    running when `deadline` seconds have elapsed are cancelled and reported as TimeoutError.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(path):
+        async with semaphore:
+            return await get_json(path, headers, timeout=timeout)
+
+    tasks = {path: asyncio.ensure_future(fetch(path)) for path in dict.fromkeys(paths)}
+    if not tasks:
+        return {}
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    results: Dict[str, object] = {}
+    for path, task in tasks.items():
+        if task in pending:
+            results[path] = TimeoutError(f"Deadline of {deadline}s exceeded")
+        elif task.exception() is not None:
+            results[path] = task.exception()
+        else:
+            results[path] = task.result()
+    return results
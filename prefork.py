@@ -0,0 +1,97 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app_factory: Callable, sock: socket.socket, log_level: str):
+    import uvicorn
+
+    # The parent installed its own handlers; uvicorn installs the ones a worker needs
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app_factory(), log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_prefork(
+    app_factory: Callable,
+    host: str,
+    port: int,
+    workers: int,
+    before_fork: Optional[Callable[[], None]] = None,
+    log_level: str = "info",
+):
+    """
+    Serve an ASGI app from `workers` forked processes sharing one listening socket.
+
+    `before_fork` runs once in the parent (e.g. loading indices) so every worker inherits the
+    loaded data copy-on-write instead of loading its own copy. `app_factory` runs in each worker,
+    since the MCP session manager and event loop must not be shared across processes.
+    Dead workers are restarted; SIGINT/SIGTERM on the parent stops them all.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Multi-worker mode requires os.fork (not available on this platform)")
+
+    sock = bind_socket(host, port)
+    if before_fork:
+        before_fork()
+    # Move everything loaded so far out of the GC's reach so collections in the workers do not
+    # touch (and therefore copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app_factory, sock, log_level)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        logging.info(f"Started worker {slot} (pid {pid}) on {host}:{port}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for slot in range(workers):
+        spawn(slot)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is None:
+            continue
+        if not stopping:
+            logging.warning(f"Worker {slot} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(0.5)
+            spawn(slot)
+    sock.close()
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from index_reduction import truncate_normalize
+from json_projection import format_pointer
+from rag_search import embed_query_async, embed_texts, get_faiss, l2_to_similarity
+from singleflight import SingleFlight
+
+# Ephemeral per-project indices live only in memory and are rebuilt from the project on demand.
+# Vectors are stored Matryoshka-truncated to keep many projects resident.
+PROJECT_INDEX_DIMENSIONS = int(os.getenv("PROJECT_INDEX_DIMENSIONS", "512"))
+PROJECT_INDEX_MAX_PROJECTS = int(os.getenv("PROJECT_INDEX_MAX_PROJECTS", "32"))
+PROJECT_INDEX_MAX_VECTORS = int(os.getenv("PROJECT_INDEX_MAX_VECTORS", "200000"))
+PROJECT_INDEX_MAX_ELEMENTS = int(os.getenv("PROJECT_INDEX_MAX_ELEMENTS", "20000"))
+# A cached index is served without re-fetching the project for this many seconds
+PROJECT_INDEX_TTL = float(os.getenv("PROJECT_INDEX_TTL", "30"))
+EMBED_BATCH_SIZE = 100
+MAX_TEXT_CHARS = 2000
+
+
+def flatten_properties(props, prefix=""):  # Recursively flatten nested properties
+    items = []
+    for k, v in props.items():
+        key = f"{prefix}{k}" if prefix else k
+        if isinstance(v, dict):
+            items.extend(flatten_properties(v, prefix=key + "."))
+        else:
+            items.append(f"{key}: {v}")
+    return items
+
+
+def _label(node: Dict) -> Optional[str]:
+    return node.get("name") or node.get("title")
+
+
+def iter_project_elements(project) -> Iterator[Tuple[Dict, List[str], List[str]]]:
+    """
+    Yield (element, pointer tokens, breadcrumb) for every element of a project tree.
+    An element is any object with "id" and "type"; the breadcrumb is the chain of named
+    ancestors (page, containers) leading to it.
+    """
+    stack = [(project, [], [])]
+    while stack:
+        node, tokens, trail = stack.pop()
+        if isinstance(node, dict):
+            if "id" in node and "type" in node:
+                yield node, tokens, trail
+            label = _label(node)
+            child_trail = trail + [label] if label and tokens else trail
+            children = [(k, v) for k, v in node.items() if isinstance(v, (dict, list)) and k != "properties"]
+            for k, v in reversed(children):
+                stack.append((v, tokens + [k], child_trail))
+        elif isinstance(node, list):
+            for i in range(len(node) - 1, -1, -1):
+                stack.append((node[i], tokens + [str(i)], trail))
+
+
+def element_to_text(element: Dict, breadcrumb: List[str]) -> str:
+    fields = {k: v for k, v in element.items()
+              if k not in ("id", "name", "title", "type", "properties") and not isinstance(v, (dict, list))}
+    prop_str = ", ".join(flatten_properties(element.get("properties") or {}))
+    field_str = ", ".join(flatten_properties(fields))
+    text = (f"Element: {_label(element) or ''}\nType: {element.get('type', '')}\n"
+            f"Path: {' > '.join(breadcrumb)}\nFields: {field_str}\nProperties: {prop_str}")
+    return text[:MAX_TEXT_CHARS]
+
+
+def flatten_project(project) -> List[Dict]:
+    """One row per element: id, type, name, breadcrumb path, JSON pointer and the text to embed."""
+    rows = []
+    for element, tokens, trail in iter_project_elements(project):
+        if len(rows) >= PROJECT_INDEX_MAX_ELEMENTS:
+            break
+        rows.append({
+            "id": element["id"],
+            "type": element.get("type"),
+            "name": _label(element),
+            "path": " > ".join(trail + [_label(element) or str(element["id"])]),
+            "pointer": format_pointer(tokens),
+            "text": element_to_text(element, trail),
+        })
+    return rows
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ProjectIndex:
+    """Flat index over one project's elements. Vectors are keyed by a hash of the element text."""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.vectors: Dict[str, np.ndarray] = {}
+        # (rows, faiss index) replaced as one unit so a concurrent search never sees them out of step
+        self.state: Tuple[List[Dict], object] = ([], None)
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self.state[0])
+
+    def update(self, rows: List[Dict], embed) -> int:
+        """
+        Re-sync with the current elements. Only new or changed element texts are embedded;
+        vectors of removed elements are dropped. Returns the number of texts embedded.
+        """
+        keys = [_text_key(r["text"]) for r in rows]
+        missing = list(dict.fromkeys(k for k in keys if k not in self.vectors))
+        texts = {k: r["text"] for k, r in zip(keys, rows)}
+        vectors = dict(self.vectors)
+        for i in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[i:i + EMBED_BATCH_SIZE]
+            for k, v in zip(batch, embed([texts[k] for k in batch])):
+                vectors[k] = truncate_normalize(v, PROJECT_INDEX_DIMENSIONS)
+        live = set(keys)
+        self.vectors = {k: v for k, v in vectors.items() if k in live}
+        index = self.state[1]
+        if keys != self.keys or index is None:
+            index = get_faiss().IndexFlatL2(PROJECT_INDEX_DIMENSIONS)
+            if keys:
+                index.add(np.stack([self.vectors[k] for k in keys]).astype("float32"))
+        self.keys = keys
+        self.state = ([{k: v for k, v in r.items() if k != "text"} for r in rows], index)
+        self.refreshed_at = time.monotonic()
+        return len(missing)
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> List[Dict]:
+        rows, index = self.state
+        if not rows:
+            return []
+        qv = truncate_normalize(query_vector.reshape(1, -1), PROJECT_INDEX_DIMENSIONS)
+        distances, indices = index.search(qv, min(top_k, len(rows)))
+        return [
+            {**rows[idx], "similarity": round(l2_to_similarity(d), 6)}
+            for d, idx in zip(distances[0], indices[0])
+            if 0 <= idx < len(rows)
+        ]
+
+
+class ProjectIndexCache:
+    """
+    LRU cache of per-project indices, keyed by (token fingerprint, project id) so one user's
+    cached project is never served to another. Bounded by project count and total vectors.
+    """
+
+    def __init__(self, max_projects: int = PROJECT_INDEX_MAX_PROJECTS, max_vectors: int = PROJECT_INDEX_MAX_VECTORS,
+                 ttl: float = PROJECT_INDEX_TTL):
+        self.max_projects = max(1, max_projects)
+        self.max_vectors = max_vectors
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], ProjectIndex]" = OrderedDict()
+        self._flight = SingleFlight("project_index")
+        self.stats = {"hits": 0, "refreshes": 0, "embedded": 0, "evictions": 0}
+
+    async def get(self, key: Tuple[str, str], fetch_project) -> ProjectIndex:
+        """Return a fresh index for `key`; `fetch_project` is an async callable returning the project JSON."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.refreshed_at < self.ttl:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+        # Concurrent searches of the same stale project share one fetch + embed
+        return await self._flight.do(key, lambda: self._refresh(key, fetch_project))
+
+    async def _refresh(self, key: Tuple[str, str], fetch_project) -> ProjectIndex:
+        project = await fetch_project()
+        entry = self._entries.get(key) or ProjectIndex()
+        # Flattening a large tree and embedding are both blocking; keep them off the event loop
+        embedded = await asyncio.to_thread(lambda: entry.update(flatten_project(project), embed_texts))
+        self.stats["refreshes"] += 1
+        self.stats["embedded"] += embedded
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._evict()
+        return entry
+
+    def _evict(self):
+        total = sum(len(e) for e in self._entries.values())
+        while len(self._entries) > 1 and (len(self._entries) > self.max_projects or total > self.max_vectors):
+            _, evicted = self._entries.popitem(last=False)
+            total -= len(evicted)
+            self.stats["evictions"] += 1
+
+    async def search(self, key: Tuple[str, str], fetch_project, query: str, top_k: int = 10) -> Tuple[List[Dict], int]:
+        """Search one project's elements; returns (matches, number of indexed elements)."""
+        entry, query_vector = await asyncio.gather(self.get(key, fetch_project), embed_query_async(query))
+        return entry.search(query_vector, top_k), len(entry)
+
+    def snapshot(self) -> Dict:
+        return {"projects": len(self._entries), "vectors": sum(len(e) for e in self._entries.values()), **self.stats}
+
+
+project_indices = ProjectIndexCache()
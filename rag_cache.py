@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CACHE_MAX_ENTRIES = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "512"))
+# Cosine similarity above which a cached result is reused for a different query text
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RAG_CACHE_SIMILARITY", "0.97"))
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different queries share an entry."""
+    return " ".join(str(query).lower().split())
+
+
+def index_version(*paths: str) -> Tuple:
+    """
+    Version token for an index built from the given files.
+    Changes whenever any of the files is rewritten, which invalidates cached results.
+    """
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            version.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append((path, None, None))
+    return tuple(version)
+
+
+class QueryCache:
+    """
+    Size-bounded LRU cache of retrieval results.
+
+    Entries are grouped by namespace (usually the index path) and tagged with the index
+    version; a version change drops every entry of that namespace. Lookups are two-tier:
+    - exact: normalized query text + top_k
+    - semantic: cosine similarity of the query embedding against cached embeddings
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, similarity_threshold: float = CACHE_SIMILARITY_THRESHOLD):
+        self.max_entries = max(0, int(max_entries))
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple] = {}
+        # (namespace, normalized query, top_k) -> (unit vector or None, value)
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[Optional[np.ndarray], object]]" = OrderedDict()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_version(self, namespace: str, version: Tuple):
+        # Caller holds the lock
+        if self._versions.get(namespace) == version:
+            return
+        if namespace in self._versions:
+            stale = [k for k in self._entries if k[0] == namespace]
+            for k in stale:
+                del self._entries[k]
+            self.stats["invalidations"] += 1
+        self._versions[namespace] = version
+
+    def get(self, namespace: str, version: Tuple, query: str, top_k: int):
+        """Exact-tier lookup. Returns the cached value or None."""
+        if not self.max_entries:
+            return None
+        key = (namespace, normalize_query(query), int(top_k))
+        with self._lock:
+            self._check_version(namespace, version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry[1]
+
+    def get_similar(self, namespace: str, version: Tuple, vector, top_k: int):
+        """Semantic-tier lookup by query embedding. Returns the cached value or None."""
+        if not self.max_entries:
+            return None
+        unit = _unit(vector)
+        with self._lock:
+            self._check_version(namespace, version)
+            keys = [k for k, (vec, _) in self._entries.items()
+                    if k[0] == namespace and k[2] == int(top_k) and vec is not None]
+            if not keys:
+                self.stats["misses"] += 1
+                return None
+            sims = np.stack([self._entries[k][0] for k in keys]) @ unit
+            best = int(np.argmax(sims))
+            if sims[best] < self.similarity_threshold:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(keys[best])
+            self.stats["semantic_hits"] += 1
+            return self._entries[keys[best]][1]
+
+    def put(self, namespace: str, version: Tuple, query: str, top_k: int, vector, value):
+        if not self.max_entries:
+            return
+        key = (namespace, normalize_query(query), int(top_k))
+        unit = _unit(vector) if vector is not None else None
+        with self._lock:
+            self._check_version(namespace, version)
+            self._entries[key] = (unit, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def drop_namespace(self, namespace: str):
+        """Forget every entry of a namespace (e.g. an index version that was swapped out)."""
+        with self._lock:
+            for k in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[k]
+            self._versions.pop(namespace, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), **self.stats}
+
+
+def _unit(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype="float32").reshape(-1)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+# Shared by rag_search and rag_qa so every tool benefits from the same bounded cache
+query_cache = QueryCache()
+
+
+def copy_results(results: List[Dict]) -> List[Dict]:
+    """Shallow-copy cached result rows so callers cannot mutate the cached entry."""
+    return [dict(r) for r in results]
@@ -1,12 +1,4 @@
-import faiss
-import openai
-import numpy as np
-import json
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from rag_search import get_index, get_openai, search_rag, search_rag_async
 
 MODEL_EMBEDDING = "text-embedding-3-small"  # or "text-embedding-ada-002"
 EMBED_DIM = 1536  # 3072 for text-embedding-3-large
@@ -23,33 +15,16 @@ If you don't know something, say you're not sure.
 
 # === FUNCTIONS ===
 def load_index_and_metadata():
-    index = faiss.read_index(INDEX_FILE)
-    with open(METADATA_FILE, "r", encoding="utf-8") as file:
-        metadata = json.load(file)
-    return index, metadata
-
-def embed_query(query, model=MODEL_EMBEDDING):
-    response = openai.embeddings.create(
-        input=[query],
-        model=model
-    )
-    return np.array(response.data[0].embedding).astype("float32")
+    return get_index(INDEX_FILE, METADATA_FILE)
+
+def _to_chunks(results):
+    return [{"score": r["score"], "title": r["title"], "text": r["text"]} for r in results]
 
 def retrieve_relevant_chunks(query,top_k=5):
-    index, metadata = load_index_and_metadata()
-    query_vector = embed_query(query).reshape(1, -1)
-    distances, indices = index.search(query_vector, min(top_k,len(metadata)))
-
-    chunks = []
-    for i, idx in enumerate(indices[0]):
-        if idx < len(metadata):
-            chunk = metadata[idx]
-            chunks.append({
-                "score": float(distances[0][i]),
-                "title": chunk["title"],
-                "text": chunk["text"],
-            })
-    return chunks
+    return _to_chunks(search_rag(query, INDEX_FILE, METADATA_FILE, top_k=top_k))
+
+async def retrieve_relevant_chunks_async(query, top_k=5):
+    return _to_chunks(await search_rag_async(query, INDEX_FILE, METADATA_FILE, top_k=top_k))
 
 def build_context(chunks):
     context = ""
@@ -62,7 +37,7 @@ def ask_openai(question, context):
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
     ]
-    response = openai.chat.completions.create(
+    response = get_openai().chat.completions.create(
         model=MODEL_CHAT,
         messages=messages,
         temperature=0.3
@@ -82,6 +57,14 @@ def get_context_from_query(query):
     print(f"Found {len(chunks)} relevant chunks.")
     context = build_context(chunks)
     return context
+
+async def get_context_from_query_async(query):
+    """Async variant of get_context_from_query used by the MCP server."""
+    chunks = await retrieve_relevant_chunks_async(query)
+    if not chunks:
+        return "No relevant information found."
+    return build_context(chunks)
+
 # === MAIN ===
 if __name__ == "__main__":
     while True:
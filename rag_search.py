@@ -1,22 +1,173 @@
-import faiss
-import openai
+import asyncio
 import json
+import logging
 import numpy as np
-from dotenv import load_dotenv
 import os
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+from rag_cache import query_cache, index_version, copy_results
+import fast_json
+from singleflight import SingleFlight
+from embedding_batcher import EmbeddingBatcher
+import index_versions
+from index_reduction import comparable_similarity, fit_query_vector
+
+if TYPE_CHECKING:
+    import faiss
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 MODEL = "text-embedding-3-small"
 EMBED_DIM = 1536
 
+# Indices served by the MCP server, preloaded at startup. Entries with an index_dir are versioned
+# (see index_versions.py) and hot-swapped when a builder publishes a new version.
+INDICES = {
+    "ninjamock_docs": {"index_path": "faiss_index.index", "metadata_path": "metadata.json"},
+    "agent_context": {"index_dir": "indices/agent_context"},
+    "ui_templates": {"index_dir": "indices/ui_templates"},
+}
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "2"))
+
+# faiss and openai are slow to import; they are loaded on first use (or by server preload)
+_openai_lock = threading.Lock()
+_openai_module = None
+
+def get_faiss():
+    import faiss
+    return faiss
+
+def get_openai():
+    """Import and configure the openai module once (loads .env on first call)."""
+    global _openai_module
+    if _openai_module is None:
+        with _openai_lock:
+            if _openai_module is None:
+                import openai
+                from dotenv import load_dotenv
+                load_dotenv()
+                openai.api_key = os.getenv("OPENAI_API_KEY")
+                _openai_module = openai
+    return _openai_module
+
 def load_index_and_metadata(index_path, metadata_path):
-    index = faiss.read_index(index_path)
-    with open(metadata_path, "r", encoding="utf-8") as file:
-        metadata = json.load(file)
+    index = get_faiss().read_index(index_path)
+    metadata = fast_json.load_file(metadata_path)
     return index, metadata
 
+_loaded_lock = threading.Lock()
+_loaded: Dict[Tuple[str, str], Tuple[Tuple, object, list]] = {}
+
+def get_index(index_path, metadata_path):
+    """
+    Return (index, metadata) from the in-process cache, reloading when the files change.
+    """
+    key = (index_path, metadata_path)
+    version = index_version(index_path, metadata_path)
+    entry = _loaded.get(key)
+    if entry is None or entry[0] != version:
+        with _loaded_lock:
+            entry = _loaded.get(key)
+            if entry is None or entry[0] != version:
+                index, metadata = load_index_and_metadata(index_path, metadata_path)
+                entry = (version, index, metadata)
+                _loaded[key] = entry
+    return entry[1], entry[2]
+
+# name -> the version currently served: {"version", "dir", "index_path", "metadata_path", "stamp",
+# "comparable_similarity"} plus the loaded "index" and "metadata". Entries are replaced, never mutated, so a request that captured one keeps
+# a consistent (index, metadata) pair even after a swap or after the old version directory is pruned.
+_active: Dict[str, Dict] = {}
+_swap_lock = threading.Lock()
+
+def _load_version(resolved) -> Dict:
+    """Load and validate a resolved index version (off the request path when called by the watcher)."""
+    stamp = index_version(resolved["index_path"], resolved["metadata_path"])
+    index, metadata = load_index_and_metadata(resolved["index_path"], resolved["metadata_path"])
+    manifest = index_versions.verify_version(resolved["dir"], index, metadata)
+    return {**resolved, "stamp": stamp, "comparable_similarity": comparable_similarity(manifest),
+            "index": index, "metadata": metadata}
+
+def _is_current(active, resolved) -> bool:
+    if resolved["version"] != active["version"]:
+        return False
+    # Legacy flat layouts have no version id and are rebuilt in place
+    return resolved["version"] is not None or active["stamp"] == index_version(resolved["index_path"], resolved["metadata_path"])
+
+def live_index(name) -> Dict:
+    """
+    The live version of a registered index: {"version", "index_path", "metadata_path", "index", "metadata", ...}.
+    Never blocks on a rebuild: a newly published version is only returned once it is fully loaded.
+    Capture the entry once per request and use its index/metadata throughout, so a concurrent swap
+    cannot send the request back to disk for an old version.
+    """
+    cfg = INDICES[name]
+    if "index_dir" not in cfg:
+        index, metadata = get_index(cfg["index_path"], cfg["metadata_path"])
+        return {"version": None, "index_path": cfg["index_path"], "metadata_path": cfg["metadata_path"],
+                "stamp": index_version(cfg["index_path"], cfg["metadata_path"]), "comparable_similarity": True,
+                "index": index, "metadata": metadata}
+    active = _active.get(name)
+    if active is None:
+        with _swap_lock:
+            active = _active.get(name)
+            if active is None:
+                active = _active[name] = _load_version(index_versions.resolve(cfg["index_dir"]))
+    return active
+
+def refresh_indices():
+    """
+    Swap in newly published index versions. The new version is loaded and checked against its
+    manifest before the swap; searches already running keep the (index, metadata) they hold.
+    """
+    for name, cfg in INDICES.items():
+        if "index_dir" not in cfg or name not in _active:
+            continue
+        resolved = index_versions.resolve(cfg["index_dir"])
+        old = _active[name]
+        if _is_current(old, resolved):
+            continue
+        start = time.perf_counter()
+        try:
+            loaded = _load_version(resolved)
+        except Exception as e:
+            logging.error(f"Not swapping index '{name}' to version {resolved['version']}: {e}")
+            continue
+        with _swap_lock:
+            _active[name] = loaded
+        query_cache.drop_namespace(old["index_path"])
+        logging.info(f"Swapped index '{name}' {old['version']} -> {resolved['version']} "
+                     f"(loaded in {time.perf_counter() - start:.2f}s)")
+
+def active_index_versions() -> Dict[str, Optional[str]]:
+    return {name: active["version"] for name, active in _active.items()}
+
+_watcher = None
+
+def start_index_watcher(interval: float = INDEX_POLL_SECONDS):
+    """Poll versioned index directories in a daemon thread and hot-swap new versions."""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return _watcher
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                refresh_indices()
+            except Exception:
+                logging.exception("Index watcher iteration failed")
+
+    _watcher = threading.Thread(target=loop, name="index-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
+
+def warm_index(name):
+    """Load a registered index and run a dummy search so the first real query does not pay for it."""
+    index = live_index(name)["index"]
+    if index.ntotal:
+        index.search(np.zeros((1, index.d), dtype="float32"), 1)
+    return index.ntotal
+
 def _offsets_path(jsonl_path: str) -> str:
     return jsonl_path + ".offsets"
 
@@ -62,29 +213,56 @@ def get_jsonl_row(jsonl_path: str, offsets: List[int], idx: int) -> Optional[Dic
         f.seek(offsets[idx])
         line = f.readline()
     try:
-        return json.loads(line.decode("utf-8"))
+        return fast_json.loads(line)
     except Exception:
         return None
 
-def load_index_and_jsonl(index_path: str, jsonl_path: str) -> Tuple[faiss.Index, List[int]]:
-    index = faiss.read_index(index_path)
+def load_index_and_jsonl(index_path: str, jsonl_path: str) -> Tuple["faiss.Index", List[int]]:
+    index = get_faiss().read_index(index_path)
     offsets = build_jsonl_offsets(jsonl_path)
     return index, offsets
 
 def embed_query(query, model=MODEL):
-    response = openai.embeddings.create(
+    response = get_openai().embeddings.create(
         input=[query],
         model=model
     )
     return np.array(response.data[0].embedding).astype("float32")
 
-def search_rag(query, index_path, metadata_path, top_k=5):
-    index, metadata = load_index_and_metadata(index_path, metadata_path)
-    query_vector = embed_query(query).reshape(1, -1)
+def embed_texts(texts, model=MODEL):
+    """Embed several texts with one API request, preserving input order."""
+    response = get_openai().embeddings.create(
+        input=list(texts),
+        model=model
+    )
+    ordered = sorted(response.data, key=lambda d: d.index)
+    return [np.array(d.embedding).astype("float32") for d in ordered]
+
+embedding_flight = SingleFlight("embeddings")
+_batchers: Dict[str, EmbeddingBatcher] = {}
+
+def get_batcher(model=MODEL) -> EmbeddingBatcher:
+    batcher = _batchers.get(model)
+    if batcher is None:
+        batcher = _batchers[model] = EmbeddingBatcher(lambda texts: embed_texts(texts, model))
+    return batcher
+
+def batcher_stats() -> Dict:
+    return {model: b.snapshot() for model, b in _batchers.items()}
+
+async def embed_query_async(query, model=MODEL):
+    """
+    Embed without blocking the event loop. Concurrent identical (model, query) calls share one
+    request, and distinct queries arriving within the batch window share one API call.
+    """
+    return await embedding_flight.do((model, query), lambda: get_batcher(model).embed(query))
+
+def search_index(index, metadata, query_vector, top_k=5):
+    query_vector = fit_query_vector(index, query_vector.reshape(1, -1))
     distances, indices = index.search(query_vector, top_k)
     results = []
     for i, idx in enumerate(indices[0]):
-        if idx < len(metadata):
+        if 0 <= idx < len(metadata):
             doc = metadata[idx]
             # Start with the score, then merge all fields from doc to preserve arbitrary metadata
             result = {"score": float(distances[0][i])}
@@ -92,9 +270,106 @@ def search_rag(query, index_path, metadata_path, top_k=5):
                 result.update(doc)
             else:
                 result["text"] = str(doc)
+            # Position of the hit in the metadata, for per-row caches of the loaded version
+            result["row"] = int(idx)
             results.append(result)
     return results
 
+def search_rag(query, index_path, metadata_path, top_k=5):
+    """
+    Embed the query and search the index, reusing cached results when the same (or a
+    semantically equivalent) query was already answered for the current index version.
+    """
+    version = index_version(index_path, metadata_path)
+    cached = query_cache.get(index_path, version, query, top_k)
+    if cached is not None:
+        return copy_results(cached)
+    query_vector = embed_query(query)
+    cached = query_cache.get_similar(index_path, version, query_vector, top_k)
+    if cached is not None:
+        # Remember the hit under this query text too, so repeats are exact hits and skip the embedding
+        query_cache.put(index_path, version, query, top_k, query_vector, cached)
+        return copy_results(cached)
+    index, metadata = get_index(index_path, metadata_path)
+    results = search_index(index, metadata, query_vector, top_k)
+    query_cache.put(index_path, version, query, top_k, query_vector, results)
+    return copy_results(results)
+
+async def _search_with_vector(query, query_vector, namespace, version, load, top_k):
+    cached = query_cache.get_similar(namespace, version, query_vector, top_k)
+    if cached is not None:
+        query_cache.put(namespace, version, query, top_k, query_vector, cached)
+        return copy_results(cached)
+
+    def _search():
+        index, metadata = load()
+        return search_index(index, metadata, query_vector, top_k)
+
+    results = await asyncio.to_thread(_search)
+    query_cache.put(namespace, version, query, top_k, query_vector, results)
+    return copy_results(results)
+
+async def _search_async(query, namespace, version, load, top_k):
+    cached = query_cache.get(namespace, version, query, top_k)
+    if cached is not None:
+        return copy_results(cached)
+    query_vector = await embed_query_async(query)
+    return await _search_with_vector(query, query_vector, namespace, version, load, top_k)
+
+async def search_rag_async(query, index_path, metadata_path, top_k=5):
+    """Async counterpart of search_rag for the MCP tools: same cache, coalesced embedding."""
+    version = index_version(index_path, metadata_path)
+    return await _search_async(query, index_path, version, lambda: get_index(index_path, metadata_path), top_k)
+
+def _search_target(name) -> Tuple[str, Tuple, object]:
+    """(cache namespace, cache version, loader of (index, metadata)) of the live version of an index."""
+    cfg = INDICES[name]
+    if "index_dir" not in cfg:
+        paths = (cfg["index_path"], cfg["metadata_path"])
+        return paths[0], index_version(*paths), lambda: get_index(*paths)
+    live = live_index(name)
+    return live["index_path"], live["stamp"], lambda: (live["index"], live["metadata"])
+
+async def search_index_async(name, query, top_k=5):
+    """search_rag_async over a registered index, pinned to the version live when the call starts."""
+    return await _search_async(query, *_search_target(name), top_k)
+
+def l2_to_similarity(distance: float) -> float:
+    """
+    Map a squared-L2 distance between unit vectors (OpenAI embeddings are normalized) to cosine
+    similarity, so scores from different IndexFlatL2 corpora are on one comparable scale.
+    """
+    return 1.0 - float(distance) / 2.0
+
+async def search_all_async(query, names: Optional[List[str]] = None, top_k=5) -> Dict[str, List[Dict]]:
+    """
+    Search several registered indices with a single query embedding, in parallel.
+    Returns {index name: results}; each result gains a "similarity" score, and "similarity_comparable"
+    which is False for reduced (PCA) indices whose similarities are not on the shared cosine scale.
+    """
+    targets = {name: _search_target(name) for name in (names or INDICES)}
+    comparable = {name: _active.get(name, {}).get("comparable_similarity", True) for name in targets}
+    results: Dict[str, List[Dict]] = {}
+    for name, (namespace, version, _) in targets.items():
+        cached = query_cache.get(namespace, version, query, top_k)
+        if cached is not None:
+            results[name] = copy_results(cached)
+
+    missing = [name for name in targets if name not in results]
+    if missing:
+        query_vector = await embed_query_async(query)
+        found = await asyncio.gather(*(
+            _search_with_vector(query, query_vector, *targets[name], top_k)
+            for name in missing
+        ))
+        results.update(zip(missing, found))
+
+    for name, rows in results.items():
+        for r in rows:
+            r["similarity"] = round(l2_to_similarity(r["score"]), 6)
+            r["similarity_comparable"] = comparable[name]
+    return results
+
 def search_rag_jsonl(query: str, index_path: str, jsonl_path: str, top_k: int = 5) -> List[Dict]:
     """
     Modern and robust RAG search using FAISS + JSONL metadata.
@@ -103,7 +378,7 @@ def search_rag_jsonl(query: str, index_path: str, jsonl_path: str, top_k: int =
     - Validates index size vs JSONL length and gracefully handles mismatches.
     """
     index, offsets = load_index_and_jsonl(index_path, jsonl_path)
-    query_vector = embed_query(query).reshape(1, -1)
+    query_vector = fit_query_vector(index, embed_query(query).reshape(1, -1))
     top_k = max(1, int(top_k))
     distances, indices = index.search(query_vector, top_k)
 
@@ -0,0 +1,137 @@
+import difflib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import fast_json
+from rag_search import live_index
+
+CHUNKS_JSONL_FILE = "chunks.jsonl"
+# Builders prepend the tail of the previous part (~180 chars) to the next one; overlaps are
+# searched up to this length and ignored below MIN_OVERLAP_CHARS to avoid false matches
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 20
+
+
+def _strip_heading(text: str, level: int, section: str) -> str:
+    prefix = f"{'#' * level} {section}\n\n"
+    return text[len(prefix):] if text.startswith(prefix) else text
+
+
+def _overlap(previous: str, following: str) -> int:
+    """Length of the longest suffix of `previous` that `following` starts with."""
+    for k in range(min(len(previous), len(following), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:k]):
+            return k
+    return 0
+
+
+class SectionIndex:
+    """
+    Anchor -> chunk-range lookup over the chunks of a sectioned corpus (agent_context).
+
+    Chunks are stored in document order, each section as a contiguous run of parts. The same
+    anchor may occur more than once (identical headings under different parents), so every
+    anchor maps to a list of (start, end) ranges. Lookups need no embedding calls.
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+        self.by_id: Dict[str, int] = {}
+        self.ranges: Dict[str, List[Tuple[int, int]]] = {}
+        self._range_of: List[Tuple[int, int]] = []
+        start = 0
+        for i, row in enumerate(rows):
+            self.by_id[row.get("id")] = i
+            if i and (row.get("anchor") != rows[i - 1].get("anchor") or row.get("part_index", 0) == 0):
+                self._add_range(start, i)
+                start = i
+        if rows:
+            self._add_range(start, len(rows))
+
+    def _add_range(self, start: int, end: int):
+        self.ranges.setdefault(self.rows[start].get("anchor"), []).append((start, end))
+        self._range_of.extend([(start, end)] * (end - start))
+
+    def anchors(self) -> List[str]:
+        return list(self.ranges)
+
+    def suggest(self, anchor: str, n: int = 5) -> List[str]:
+        return difflib.get_close_matches(anchor, self.anchors(), n=n, cutoff=0.4)
+
+    def merge(self, positions: List[int]) -> str:
+        """Join parts of one section into a single text: heading once, overlaps between consecutive parts removed."""
+        pieces = []
+        previous, previous_pos = None, None
+        for pos in positions:
+            row = self.rows[pos]
+            body = row["text"] if not pieces else _strip_heading(row["text"], row.get("level", 0), row.get("section", ""))
+            if previous is not None and pos == previous_pos + 1:
+                # A part that starts a new paragraph carries the previous tail at most once; a window
+                # of a long paragraph carries it twice (prepended tail + windowed split) and continues mid-text
+                removed, k = 0, _overlap(previous, body)
+                while k:
+                    body, removed, k = body[k:], removed + 1, _overlap(previous, body[k:])
+                if removed < 2:
+                    body = "\n\n" + body.lstrip("\n")
+            elif pieces:
+                body = "…\n\n" + body
+            pieces.append(body)
+            previous, previous_pos = row["text"], pos
+        return "".join(pieces)
+
+    def section(self, start: int, end: int, parts: Optional[List[int]] = None) -> Dict:
+        first = self.rows[start]
+        positions = list(range(start, end))
+        if parts is not None:
+            wanted = set(parts)
+            positions = [p for p in positions if self.rows[p].get("part_index", p - start) in wanted]
+        return {
+            "section": first.get("section"),
+            "anchor": first.get("anchor"),
+            "level": first.get("level"),
+            "path": first.get("path"),
+            "tags": first.get("tags", []),
+            "total_parts": end - start,
+            "parts": [self.rows[p].get("part_index") for p in positions],
+            "chunk_ids": [self.rows[p].get("id") for p in positions],
+            "text": self.merge(positions) if positions else "",
+        }
+
+    def lookup(self, anchor: str, parts: Optional[List[int]] = None) -> List[Dict]:
+        return [self.section(start, end, parts) for start, end in self.ranges.get(anchor, [])]
+
+    def neighbours(self, chunk_id: str, n: int) -> Optional[Tuple[int, int, List[int]]]:
+        """(section start, section end, positions of the chunk and up to n parts either side) or None."""
+        pos = self.by_id.get(chunk_id)
+        if pos is None:
+            return None
+        start, end = self._range_of[pos]
+        return start, end, list(range(max(start, pos - n), min(end, pos + n + 1)))
+
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[Tuple, SectionIndex]] = {}
+
+
+def _load_rows(chunks_path: str, live: Dict) -> List[Dict]:
+    if os.path.exists(chunks_path):
+        with open(chunks_path, "rb") as f:
+            return [fast_json.loads(line) for line in f if line.strip()]
+    # Older builds only wrote metadata.json, which holds the same rows (already loaded for search)
+    return live["metadata"]
+
+
+def get_section_index(name: str = "agent_context") -> SectionIndex:
+    """SectionIndex of the live version of a registered index; rebuilt when that version changes."""
+    live = live_index(name)
+    chunks_path = os.path.join(os.path.dirname(live["metadata_path"]), CHUNKS_JSONL_FILE)
+    version = (live["version"], live["stamp"])
+    entry = _cache.get(name)
+    if entry is None or entry[0] != version:
+        with _lock:
+            entry = _cache.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, SectionIndex(_load_rows(chunks_path, live)))
+                _cache[name] = entry
+    return entry[1]
@@ -1,13 +1,35 @@
 
+import time
+_process_start = time.perf_counter()
 from fastmcp import FastMCP,Context
-from fastmcp.server.dependencies import get_http_headers
-from rag_search import search_rag
-import requests
+from fastmcp.server.dependencies import get_http_headers, get_http_request
+from fastmcp.tools.tool import ToolResult
+from mcp.types import TextContent
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from rag_search import search_index_async, search_all_async, live_index, INDICES, start_index_watcher, active_index_versions, embedding_flight, batcher_stats
 import logging
-from rag_qa import get_context_from_query
-mcp = FastMCP("server",port=8000,host="0.0.0.0",stateless_http=True)
+import os
+from typing import List, Optional
+from rag_qa import get_context_from_query_async
+from rag_cache import query_cache
+import ninjamock_api
+import fast_json
+from admission import AdmissionController, AdmissionMiddleware
+from singleflight import token_fingerprint
+from project_index import project_indices
+from section_index import get_section_index
+from startup import StartupReport, preload
+startup_report = StartupReport(started_at=_process_start)
+startup_report.record("import_modules", _process_start)
+HOST = os.getenv("MCP_HOST", "0.0.0.0")
+PORT = int(os.getenv("MCP_PORT", "8000"))
+MAX_BULK_ELEMENTS = int(os.getenv("MAX_BULK_ELEMENTS", "200"))
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", "50"))
+MAX_NEIGHBOURS = 10
+mcp = FastMCP("server",port=PORT,host=HOST,stateless_http=True,tool_serializer=fast_json.dumps_str)
+admission = AdmissionController()
 logging.basicConfig(level=logging.DEBUG)
-baseUrl = "https://plugins.ninjamock.com"
 
 # # MCP tools para interactuar con la API de Ninjamock usando token en header
 def _get_auth_headers():
@@ -60,60 +82,176 @@ def _get_auth_headers():
         return headers
     except RuntimeError:
         return {}
+
+def _cap_top_k(top_k: int) -> int:
+    return max(1, min(int(top_k), MAX_TOP_K))
+
+def _tool_result(structured: dict, text_view: Optional[dict] = None) -> ToolResult:
+    """
+    Tool response for large payloads. The text content is serialized from `text_view` (default:
+    `structured`), in which static parts may be pre-serialized fragments (see fast_json.fragment).
+    `structured` must already be JSON-native (parsed JSON, plain dicts/lists/str/numbers): it is
+    handed over as structured content without ToolResult's deep conversion copy.
+    """
+    result = ToolResult(content=[TextContent(type="text", text=fast_json.dumps_str(structured if text_view is None else text_view))])
+    result.structured_content = structured
+    return result
+
+def _admission_key() -> str:
+    """
+    Admission client key: the token fingerprint (the token itself is never stored), or the client
+    address for unauthenticated calls so anonymous agents do not share one client's limits.
+    Behind a proxy the address is the one uvicorn resolves from X-Forwarded-For (--forwarded-allow-ips).
+    """
+    headers = _get_auth_headers()
+    if headers:
+        return token_fingerprint(headers)
+    try:
+        client = get_http_request().client
+    except RuntimeError:
+        client = None
+    return f"addr:{client.host}" if client else "anonymous"
+
+# Per-client and global limits in front of every tool
+mcp.add_middleware(AdmissionMiddleware(admission, _admission_key))
+
+@mcp.custom_route("/ready", methods=["GET"])
+async def readiness(request: Request) -> JSONResponse:
+    """
+    Readiness probe: 200 once all indices are preloaded and warmed, 503 otherwise.
+    The body carries the cold-start time broken down by phase.
+    """
+    report = startup_report.to_dict()
+    return JSONResponse(report, status_code=200 if startup_report.ready else 503)
+
+@mcp.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    """Index versions, cache, request-coalescing and admission counters for this worker process."""
+    return JSONResponse({
+        "pid": os.getpid(),
+        "index_versions": active_index_versions(),
+        "query_cache": query_cache.snapshot(),
+        "coalescing": {
+            "ninjamock": ninjamock_api.upstream_flight.snapshot(),
+            "embeddings": embedding_flight.snapshot(),
+        },
+        "embedding_batching": batcher_stats(),
+        "admission": admission.snapshot(),
+        "project_indices": project_indices.snapshot(),
+    })
+
 @mcp.tool()
-def get_ninjamock_project_metadata(project_id: str, mcp_ctx: Context = None) -> dict:
+async def get_ninjamock_project_metadata(project_id: str, mcp_ctx: Context = None) -> dict:
     """
     Retrieves the metadata of a Ninjamock project by its ID.
     Requires authentication via token in the 'Authorization' header.
     """
-    api_url = f"{baseUrl}/api/v1/projects/{project_id}/metadata"
+    api_path = f"/api/v1/projects/{project_id}/metadata"
     headers = _get_auth_headers()
     try:
-        response = requests.get(api_url, headers=headers, timeout=5)
-        response.raise_for_status()
-        return {"metadata": response.json()}
+        return {"metadata": await ninjamock_api.get_json(api_path, headers, timeout=5)}
     except Exception as e:
         return {"metadata": None, "error": str(e)}
 
 @mcp.tool()
-def get_ninjamock_project_full(project_id: str, mcp_ctx: Context) -> dict:
+async def get_ninjamock_project_full(
+    project_id: str,
+    mcp_ctx: Context,
+    pointer: Optional[str] = None,
+    max_depth: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+) -> dict:
     """
     Retrieves the full Ninjamock project by its ID in JSON format.
     Requires authentication via token in the 'Authorization' header.
+    For large projects, narrow the response instead of fetching everything:
+    - pointer: JSON pointer to the part to return, e.g. "/pages/0" or "/pages/0/elements"
+    - max_depth: nested objects/arrays deeper than this are replaced by {"truncated": true, "type": ...}
+    - fields: keep only these keys in every object, e.g. ["id", "name", "type", "children"]
     """
-    api_url = f"{baseUrl}/api/v1/projects/{project_id}"
+    api_path = f"/api/v1/projects/{project_id}"
 
     headers = _get_auth_headers()
     logging.info(f"Fetching project {project_id} from Ninjamock API with headers: {headers} context: {mcp_ctx}")
     #  mcp_ctx.info(f"Fetching project {project_id} from Ninjamock API with headers: {headers} context: {mcp_ctx}")
     try:
-        response = requests.get(api_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        return {"project": response.json()}
+        if pointer is None and max_depth is None and not fields:
+            # Whole document: embed the upstream bytes in the text content instead of re-serializing the tree
+            project, body = await ninjamock_api.get_json_with_body(api_path, headers, timeout=10)
+            return _tool_result({"project": project}, {"project": fast_json.fragment(project, body)})
+        project = await ninjamock_api.get_json_projected(
+            api_path, headers, timeout=10, pointer=pointer, max_depth=max_depth, fields=fields
+        )
+        return _tool_result({"project": project})
     except Exception as e:
         return {"project": None, "error": str(e)}
 
 @mcp.tool()
-def get_ninjamock_project_element_by_id(project_id: str, element_id: str, mcp_ctx=None) -> dict:
+async def get_ninjamock_project_element_by_id(project_id: str, element_id: str, mcp_ctx=None) -> dict:
     """
     Retrieves a specific element of a Ninjamock project by its ID in JSON format.
     Requires authentication via token in the 'Authorization' header.
     """
-    api_url = f"{baseUrl}/api/v1/projects/{project_id}/element/{element_id}"
+    api_path = f"/api/v1/projects/{project_id}/element/{element_id}"
     headers = _get_auth_headers()
     try:
-        response = requests.get(api_url, headers=headers, timeout=5)
-        response.raise_for_status()
-        return {"element": response.json()}
+        return {"element": await ninjamock_api.get_json(api_path, headers, timeout=5)}
     except Exception as e:
         return {"element": None, "error": str(e)}
      
 @mcp.tool()
-def search_ninjamock_docs(query: str) -> dict:
+async def get_ninjamock_project_elements(project_id: str, element_ids: List[str], deadline_seconds: float = 15) -> dict:
+    """
+    Retrieves several elements of a Ninjamock project in one call, fetched concurrently.
+    Prefer this over repeated get_ninjamock_project_element_by_id calls when you need more than one element.
+    Returns the elements that could be fetched keyed by id, plus per-id errors for the ones that failed
+    or did not finish within deadline_seconds.
+    Requires authentication via token in the 'Authorization' header.
+    """
+    ids = list(dict.fromkeys(element_ids))
+    if len(ids) > MAX_BULK_ELEMENTS:
+        return {"elements": {}, "errors": {}, "error": f"At most {MAX_BULK_ELEMENTS} element ids per call"}
+    headers = _get_auth_headers()
+    paths = {element_id: f"/api/v1/projects/{project_id}/element/{element_id}" for element_id in ids}
+    results = await ninjamock_api.get_many_json(list(paths.values()), headers, timeout=5, deadline=deadline_seconds)
+    elements, errors = {}, {}
+    for element_id, path in paths.items():
+        result = results[path]
+        if isinstance(result, Exception):
+            errors[element_id] = str(result) or type(result).__name__
+        else:
+            elements[element_id] = result
+    return _tool_result({"elements": elements, "errors": errors, "requested": len(ids), "fetched": len(elements)})
+
+@mcp.tool()
+async def search_project_elements(project_id: str, query: str, top_k: int = 10) -> dict:
+    """
+    Semantic search over the elements of a Ninjamock project, e.g. "the login form" or "checkout button".
+    Returns only the matching elements: id, type, name, path (page > containers > element), a JSON pointer
+    usable with get_ninjamock_project_full(pointer=...), and a similarity score (higher is better).
+    Use get_ninjamock_project_element_by_id to fetch the full element afterwards.
+    Requires authentication via token in the 'Authorization' header.
+    """
+    top_k = _cap_top_k(top_k)
+    api_path = f"/api/v1/projects/{project_id}"
+    headers = _get_auth_headers()
+    try:
+        results, indexed = await project_indices.search(
+            (token_fingerprint(headers), project_id),
+            lambda: ninjamock_api.get_json(api_path, headers, timeout=10),
+            query,
+            top_k=top_k,
+        )
+        return {"answer": f"Found {len(results)} matching elements out of {indexed}.", "results": results}
+    except Exception as e:
+        return {"answer": "Error searching project elements.", "error": str(e), "results": []}
+
+@mcp.tool()
+async def search_ninjamock_docs(query: str) -> dict:
     """
     Searches the Ninjamock documentation for a specific query.
     """
-    context = get_context_from_query(query)
+    context = await get_context_from_query_async(query)
     if not context:
         return {
             "answer": "No relevant information found in the Ninjamock documentation.",
@@ -126,70 +264,192 @@ def search_ninjamock_docs(query: str) -> dict:
         "context": answer
     }
 
+def _summarize_template(r: dict) -> dict:
+    return {
+        "title": r["title"],
+        "templateId": r["templateId"],
+        "type": r["type"],
+        "category": r["category"],
+        "description": r.get("text", ""),
+        "properties": r.get("properties", {}),
+        "defaultProperties": r.get("defaultProperties", {}),
+    }
+
+# Template summaries are static for an index version, so they are serialized once per version
+_template_fragments = {"metadata": None, "by_row": []}
+
+def _preserialize_templates() -> list:
+    """
+    Pre-serialized summary of every row of the live ui_templates version, by metadata position
+    (templateIds are not guaranteed unique). Rebuilt after a swap.
+    """
+    metadata = live_index("ui_templates")["metadata"]
+    if _template_fragments["metadata"] is not metadata:
+        by_row = [fast_json.fragment(_summarize_template(r)) for r in metadata]
+        _template_fragments.update(metadata=metadata, by_row=by_row)
+    return _template_fragments["by_row"]
+
+# Summary inputs of a template row; a result sharing all of them (by identity) with the live row
+# summarizes identically
+_TEMPLATE_SUMMARY_FIELDS = ("title", "templateId", "type", "category", "text", "properties", "defaultProperties")
+
+def _template_fragments_for(results: List[dict], summary: List[dict]) -> list:
+    """Pre-serialized summaries for `results`, falling back to `summary` for rows of another version."""
+    fragments = _preserialize_templates()
+    metadata = _template_fragments["metadata"]
+    out = []
+    for r, s in zip(results, summary):
+        row = r.get("row")
+        # Results can come from an older version (query cache, search in flight during a swap)
+        if row is not None and row < len(metadata) and all(r.get(k) is metadata[row].get(k) for k in _TEMPLATE_SUMMARY_FIELDS):
+            out.append(fragments[row])
+        else:
+            out.append(s)
+    return out
+
+def _summarize_context_chunk(r: dict) -> dict:
+    return {
+        "score": r.get("score"),
+        "section": r.get("section"),
+        "anchor": r.get("anchor"),
+        "level": r.get("level"),
+        "path": r.get("path"),
+        "tags": r.get("tags", []),
+        "part_index": r.get("part_index"),
+        "text": r.get("text"),
+    }
+
+def _summarize_doc_chunk(r: dict) -> dict:
+    return {"title": r.get("title"), "text": r.get("text")}
+
+# How search_all presents a hit from each corpus (same fields as the per-corpus tools)
+_CORPUS_SUMMARIZERS = {
+    "ninjamock_docs": _summarize_doc_chunk,
+    "agent_context": _summarize_context_chunk,
+    "ui_templates": _summarize_template,
+}
+
 @mcp.tool()
-def search_ui_templates(query: str, top_k: int = 5) -> dict:
+async def search_ui_templates(query: str, top_k: int = 5) -> dict:
     """
     Search and retrieve the most relevant UI templates for the query using RAG.
     Returns templates that the agent can use to create new elements by templateId.
     """
-    index_path = "indices/ui_templates/faiss_index.index"
-    metadata_path = "indices/ui_templates/metadata.json"
+    top_k = _cap_top_k(top_k)
     try:
-        results = search_rag(query, index_path, metadata_path, top_k=top_k)
+        results = await search_index_async("ui_templates", query, top_k=top_k)
         if not results:
             return {"answer": "No relevant UI templates found for the query.", "results": []}
         # Summarize for the agent: only show key fields
-        summary = [
-            {
-                "title": r["title"],
-                "templateId": r["templateId"],
-                "type": r["type"],
-                "category": r["category"],
-                "description": r.get("text", ""),
-                "properties": r.get("properties", {}),
-                "defaultProperties": r.get("defaultProperties", {}),
-            }
-            for r in results
-        ]
-        return {
-            "answer": f"Found {len(summary)} relevant UI templates.",
-            "results": summary
-        }
+        summary = [_summarize_template(r) for r in results]
+        answer = f"Found {len(summary)} relevant UI templates."
+        return _tool_result(
+            {"answer": answer, "results": summary},
+            {"answer": answer, "results": _template_fragments_for(results, summary)},
+        )
     except Exception as e:
         return {"answer": "Error searching UI templates.", "error": str(e), "results": []}
 
+def _expand_neighbours(results: List[dict], neighbours: int) -> List[dict]:
+    """
+    Replace each hit's text with the hit plus up to `neighbours` adjacent parts of the same section
+    (direct lookup, no embedding). Parts already returned for an earlier hit are not repeated.
+    """
+    sections = get_section_index("agent_context")
+    covered = set()
+    expanded = []
+    for r in results:
+        found = sections.neighbours(r.get("id"), neighbours)
+        if found is None:
+            expanded.append(_summarize_context_chunk(r))
+            continue
+        start, end, positions = found
+        if sections.by_id[r["id"]] in covered:
+            continue
+        positions = [p for p in positions if p not in covered]
+        covered.update(positions)
+        summary = _summarize_context_chunk(r)
+        summary["text"] = sections.merge(positions)
+        summary["parts"] = [sections.rows[p].get("part_index") for p in positions]
+        summary["total_parts"] = end - start
+        expanded.append(summary)
+    return expanded
+
 @mcp.tool()
-def search_agent_design_context(query: str, top_k: int = 5) -> dict:
+async def search_agent_design_context(query: str, top_k: int = 5, neighbours: int = 0) -> dict:
     """
     Retrieve authoritative design knowledge for element/template creation from agent_context.md (indexed with FAISS).
     Use this tool whenever you need to know which templates exist, valid element types, properties, states/tokens,
     and instantiation rules (e.g., inline vs templated-element). Treat results as the source of truth and do not invent
     templates/types/properties that are not documented. Returns relevant chunks with metadata (section, anchor, level,
     path, tags, part_index) and text suitable for citation.
+    Set neighbours > 0 to also include that many adjacent parts of the same section around each hit
+    (for rules split across parts); use get_agent_context_section for a whole section.
     """
-    index_path = "indices/agent_context/faiss_index.index"
-    metadata_path = "indices/agent_context/metadata.json"
+    top_k = _cap_top_k(top_k)
+    neighbours = max(0, min(int(neighbours), MAX_NEIGHBOURS))
     try:
-        results = search_rag(query, index_path, metadata_path, top_k=top_k)
+        results = await search_index_async("agent_context", query, top_k=top_k)
         if not results:
             return {"answer": "No relevant context found.", "results": []}
-        concise = [
-            {
-                "score": r.get("score"),
-                "section": r.get("section"),
-                "anchor": r.get("anchor"),
-                "level": r.get("level"),
-                "path": r.get("path"),
-                "tags": r.get("tags", []),
-                "part_index": r.get("part_index"),
-                "text": r.get("text"),
-            }
-            for r in results
-        ]
+        if neighbours:
+            concise = _expand_neighbours(results, neighbours)
+        else:
+            concise = [_summarize_context_chunk(r) for r in results]
         return {"answer": f"Found {len(concise)} relevant context chunks.", "results": concise}
     except Exception as e:
         return {"answer": "Error searching agent context.", "error": str(e), "results": []}
 
+@mcp.tool()
+async def get_agent_context_section(anchor: str, parts: Optional[List[int]] = None) -> dict:
+    """
+    Return a whole section of agent_context.md by its anchor (the "anchor" field of search_agent_design_context
+    results), with all parts merged into one text. Use parts to return only some part_index values.
+    Served by direct lookup, without a search. If the same heading occurs in several places, every occurrence
+    is returned in document order.
+    """
+    try:
+        sections = get_section_index("agent_context")
+        found = sections.lookup(anchor, parts)
+        if not found:
+            return {"answer": f"Unknown anchor '{anchor}'.", "suggestions": sections.suggest(anchor), "sections": []}
+        return {"answer": f"Found {len(found)} section(s) for anchor '{anchor}'.", "sections": found}
+    except Exception as e:
+        return {"answer": "Error reading agent context section.", "error": str(e), "sections": []}
+
+@mcp.tool()
+async def search_all(query: str, top_k: int = 10, corpora: Optional[List[str]] = None) -> dict:
+    """
+    One-shot knowledge lookup across every corpus: Ninjamock documentation ("ninjamock_docs"),
+    design rules from agent_context.md ("agent_context") and UI templates ("ui_templates").
+    The query is embedded once and all corpora are searched in parallel. Results are merged into a
+    single ranking by cosine similarity (higher is better), each tagged with its "corpus". When a corpus
+    is served from a PCA-reduced index, whose similarities run on a different scale, corpora are
+    interleaved by rank instead. Use corpora to restrict the search to a subset.
+    """
+    top_k = _cap_top_k(top_k)
+    names = corpora or list(INDICES)
+    unknown = [n for n in names if n not in INDICES]
+    if unknown:
+        return {"answer": f"Unknown corpora: {unknown}. Available: {list(INDICES)}", "results": []}
+    try:
+        per_corpus = await search_all_async(query, names, top_k=top_k)
+        hits = [(rank, name, r) for name, rows in per_corpus.items() for rank, r in enumerate(rows)]
+        if all(r["similarity_comparable"] for _, _, r in hits):
+            hits.sort(key=lambda h: h[2]["similarity"], reverse=True)
+        else:
+            hits.sort(key=lambda h: h[0])
+        merged = [
+            {"corpus": name, "similarity": r["similarity"], **_CORPUS_SUMMARIZERS[name](r)}
+            for _, name, r in hits[:top_k]
+        ]
+        if not merged:
+            return {"answer": "No relevant results found.", "results": []}
+        counts = {name: sum(1 for r in merged if r["corpus"] == name) for name in names}
+        return {"answer": f"Found {len(merged)} relevant results.", "per_corpus": counts, "results": merged}
+    except Exception as e:
+        return {"answer": "Error searching corpora.", "error": str(e), "results": []}
+
 # @mcp.tool()
 # def prepare_design_knowledge_for_request(user_request: str) -> dict:
 #     """
@@ -222,6 +482,39 @@ def search_agent_design_context(query: str, top_k: int = 5) -> dict:
 #         "workflow_complete": True
 #     }
 
+_PRELOAD_PHASES = {"preserialize:ui_templates": _preserialize_templates}
+
+def _preload_for_workers():
+    # Workers scale across processes; OpenMP threads inside each one would only oversubscribe
+    # the cores, and an OpenMP pool started before fork is not usable in the children
+    preload(startup_report, INDICES, _PRELOAD_PHASES, faiss_threads=1)
+
+def _worker_app():
+    # Threads do not survive fork, so each worker runs its own index watcher
+    start_index_watcher()
+    return mcp.http_app(transport="streamable-http")
+
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http")
+    import argparse
+    parser = argparse.ArgumentParser(description="Ninjamock MCP server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")),
+                        help="number of pre-forked worker processes sharing the port")
+    args = parser.parse_args()
+    if args.workers > 1:
+        # Indices are loaded once in the parent and shared copy-on-write by every worker
+        from prefork import serve_prefork
+        serve_prefork(
+            _worker_app,
+            args.host,
+            args.port,
+            args.workers,
+            before_fork=_preload_for_workers,
+        )
+    else:
+        # Load and warm every index before binding the port so no request hits a cold index
+        preload(startup_report, INDICES, _PRELOAD_PHASES)
+        start_index_watcher()
+        mcp.run(transport="streamable-http", host=args.host, port=args.port)
 
@@ -0,0 +1,46 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one underlying call.
+
+    The first caller for a key runs `fn`; callers arriving while it is in flight await the same
+    task and receive the same result (or exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "executed": 0, "collapsed": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.stats["executed"] += 1
+        else:
+            self.stats["collapsed"] += 1
+        # shield: a cancelled caller (even the first one) must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure whose callers all went away is not logged as unhandled
+            task.exception()
+
+    def snapshot(self) -> Dict:
+        return {"inflight": len(self._inflight), **self.stats}
+
+
+def token_fingerprint(headers: Dict[str, str]) -> str:
+    """Hash of the auth token so coalescing keys never hold the credential itself."""
+    token = headers.get("Authorization", "")
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,73 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class StartupReport:
+    """
+    Records how long each cold-start phase took and whether the server is ready for traffic.
+    """
+
+    def __init__(self, started_at: float = None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.phases: List[Dict] = []
+        self.ready = False
+        self.errors: List[str] = []
+        self._total = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.errors.append(f"{name}: {e}")
+            logging.exception(f"Startup phase '{name}' failed")
+        finally:
+            self.phases.append({"phase": name, "seconds": round(time.perf_counter() - start, 4)})
+
+    def record(self, name: str, start: float, end: float = None):
+        """Record a phase that was timed outside of `phase()` (e.g. module imports)."""
+        end = end if end is not None else time.perf_counter()
+        self.phases.append({"phase": name, "seconds": round(end - start, 4)})
+
+    def to_dict(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "total_seconds": self._total if self._total is not None else round(time.perf_counter() - self.started_at, 4),
+            "phases": list(self.phases),
+            "errors": list(self.errors),
+        }
+
+    def mark_ready(self):
+        self._total = round(time.perf_counter() - self.started_at, 4)
+        self.ready = not self.errors
+
+
+def preload(report: StartupReport, indices: Dict[str, Dict],
+            extra_phases: Optional[Dict[str, Callable[[], object]]] = None,
+            faiss_threads: Optional[int] = None) -> StartupReport:
+    """
+    Import heavy dependencies, load every configured index and run a dummy search on each,
+    so the first request does not pay for any of it. `extra_phases` run last, each timed as a phase.
+    `faiss_threads` caps faiss's OpenMP threads right after the import, before any search.
+    """
+    from rag_search import get_faiss, get_openai, warm_index
+
+    with report.phase("import_faiss"):
+        faiss = get_faiss()
+        if faiss_threads:
+            faiss.omp_set_num_threads(faiss_threads)
+    with report.phase("import_openai"):
+        get_openai()
+    for name in indices:
+        with report.phase(f"load_and_warm:{name}"):
+            ntotal = warm_index(name)
+            logging.info(f"Preloaded index '{name}' with {ntotal} vectors")
+    for name, fn in (extra_phases or {}).items():
+        with report.phase(name):
+            fn()
+    report.mark_ready()
+    logging.info(f"Startup report: {report.to_dict()}")
+    return report
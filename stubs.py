@@ -0,0 +1,267 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBED_DIM = 1536
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list:
+    """Deterministic unit vector derived from the text, so repeated queries embed identically."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return (v / np.linalg.norm(v)).tolist()
+
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/embeddings"):
+            self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        stub = self.server.stub
+        stub.record(len(inputs))
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.should_fail():
+            self._send(500, {"error": {"message": "stub failure", "type": "server_error"}})
+            return
+        if any(not str(text).strip() for text in inputs):
+            # Like the real API, one invalid input rejects the whole request
+            self._send(400, {"error": {"message": "'$.input' is invalid.", "type": "invalid_request_error"}})
+            return
+        dim = int(body.get("dimensions") or stub.dim)
+        self._send(200, {
+            "object": "list",
+            "model": body.get("model", "stub"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(text), dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (deadline/cancellation); nothing to report
+            pass
+
+
+class StubEmbeddingServer:
+    """
+    Local stand-in for the OpenAI embeddings endpoint.
+    Point the openai client at it with OPENAI_BASE_URL=<server.base_url>.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, dim: int = EMBED_DIM,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.dim = dim
+        self.error_rate = error_rate
+        self.requests = 0
+        self.inputs = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _EmbeddingHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record(self, n_inputs: int):
+        with self._lock:
+            self.requests += 1
+            self.inputs += n_inputs
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return bool(self._rng.random() < self.error_rate)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_project(pages: int = 20, elements_per_page: int = 200, depth: int = 3, project_id: str = "demo") -> dict:
+    """A Ninjamock-shaped project (pages -> nested elements) whose size scales with the arguments."""
+
+    def element(path: str, level: int) -> dict:
+        return {
+            "id": f"el-{path}",
+            "name": f"Element {path}",
+            "type": ["container", "text", "button", "image"][level % 4],
+            "properties": {
+                "x": level * 10, "y": level * 20, "width": 120, "height": 40,
+                "text": f"Lorem ipsum {path} " * 3,
+                "color": {"type": "solid", "alpha": 1, "color": "#336699"},
+            },
+            "states": [],
+            "children": [element(f"{path}.{i}", level + 1) for i in range(2)] if level < depth else [],
+        }
+
+    per_root = max(1, elements_per_page // (2 ** (depth + 1) - 1))
+    return {
+        "id": project_id,
+        "name": f"Project {project_id}",
+        "pages": [
+            {"id": f"page-{p}", "name": f"Page {p}", "elements": [element(f"{p}-{e}", 0) for e in range(per_root)]}
+            for p in range(pages)
+        ],
+    }
+
+
+def _iter_elements(node):
+    if isinstance(node, dict):
+        if "id" in node and "type" in node:
+            yield node
+        for v in node.values():
+            yield from _iter_elements(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _iter_elements(v)
+
+
+class _NinjamockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.record_request()
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.should_fail():
+            self._send(503, b'{"error": "stub failure"}')
+            return
+        parts = self.path.split("?")[0].strip("/").split("/")
+        # api/v1/projects/{id}[/metadata | /element/{element_id}]
+        if len(parts) < 4 or parts[:3] != ["api", "v1", "projects"]:
+            self._send(404, b'{"error": "not found"}')
+            return
+        if len(parts) == 4:
+            self._send(200, stub.project_bytes, gzipped=stub.project_gzip)
+        elif len(parts) == 5 and parts[4] == "metadata":
+            self._send(200, json.dumps({"id": parts[3], "name": stub.project["name"], "pages": len(stub.project["pages"])}).encode())
+        elif len(parts) == 6 and parts[4] == "element":
+            element = stub.elements.get(parts[5])
+            if element is None:
+                self._send(404, b'{"error": "element not found"}')
+            else:
+                self._send(200, json.dumps(element).encode())
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def _send(self, status: int, data: bytes, gzipped: bytes = None):
+        if "gzip" in self.headers.get("accept-encoding", "") and len(data) > 1024:
+            data = gzipped or gzip.compress(data, compresslevel=5)
+            encoding = "gzip"
+        else:
+            encoding = None
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        if encoding:
+            self.send_header("content-encoding", encoding)
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (deadline/cancellation); nothing to report
+            pass
+
+
+class StubNinjamockServer:
+    """
+    Local stand-in for plugins.ninjamock.com serving one synthetic project for any project id.
+    Point the server at it with NINJAMOCK_BASE_URL=<stub.base_url>.
+    """
+
+    def __init__(self, project: dict = None, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.set_project(project if project is not None else synthetic_project())
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _NinjamockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_project(self, project: dict):
+        """Serve a new version of the project (simulates edits made in Ninjamock)."""
+        project_bytes = json.dumps(project).encode("utf-8")
+        self.project_gzip = gzip.compress(project_bytes, compresslevel=5)
+        self.project_bytes = project_bytes
+        self.elements = {e["id"]: e for e in _iter_elements(project["pages"])}
+        self.project = project
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return bool(self._rng.random() < self.error_rate)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()